@@ -11,7 +11,12 @@ ALLOWED_HOSTS = ['*']
 
 DATABASES['default'] = env.db('DATABASE_URL')  # noqa F405
 DATABASES['default']['ATOMIC_REQUESTS'] = True  # noqa F405
-DATABASES['default']['CONN_MAX_AGE'] = 0  # noqa F405
+# Nextflow sends many small callbacks per run: reuse connections rather than reconnecting per request
+# https://docs.djangoproject.com/en/dev/ref/databases/#persistent-connections
+DATABASES['default']['CONN_MAX_AGE'] = env.int('DJANGO_CONN_MAX_AGE', default=60)  # noqa F405
+DATABASES['default']['CONN_HEALTH_CHECKS'] = True  # noqa F405
+# Required if connections go through a transaction-mode pooler such as PgBouncer
+DATABASES['default']['DISABLE_SERVER_SIDE_CURSORS'] = env.bool('DJANGO_DB_BEHIND_POOLER', default=False)  # noqa F405
 
 # SECURITY
 # ------------------------------------------------------------------------------
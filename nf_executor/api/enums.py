@@ -27,11 +27,11 @@ class JobStatus(ModelHelper, IntEnum):
     @classmethod
     def is_active(cls, status) -> bool:
         """An active job: work that is running or planned. Pending cancels are neither active nor resolved"""
-        return status in {cls.started, cls.submitted}
+        return status in ACTIVE_JOB_STATUSES
 
     @classmethod
     def is_resolved(cls, status) -> bool:
-        return status in {cls.error, cls.completed, cls.canceled}
+        return status in RESOLVED_JOB_STATUSES
 
     @classmethod
     def task_to_job(cls, status: 'TaskStatus') -> 'JobStatus':
@@ -72,8 +72,16 @@ class TaskStatus(ModelHelper, IntEnum):
 
     @classmethod
     def is_active(cls, status):
-        return status in {cls.NEW, cls.SUBMITTED, cls.RUNNING}
+        return status in ACTIVE_TASK_STATUSES
 
     @classmethod
     def is_resolved(cls, status):
-        return status in {cls.ABORTED, cls.FAILED, cls.COMPLETED}
+        return status in RESOLVED_TASK_STATUSES
+
+
+# Status groups, built once. (defined outside the enums, where they would otherwise become members)
+ACTIVE_JOB_STATUSES = frozenset({JobStatus.started, JobStatus.submitted})
+RESOLVED_JOB_STATUSES = frozenset({JobStatus.error, JobStatus.completed, JobStatus.canceled})
+
+ACTIVE_TASK_STATUSES = frozenset({TaskStatus.NEW, TaskStatus.SUBMITTED, TaskStatus.RUNNING})
+RESOLVED_TASK_STATUSES = frozenset({TaskStatus.ABORTED, TaskStatus.FAILED, TaskStatus.COMPLETED})
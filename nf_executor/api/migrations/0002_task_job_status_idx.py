@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-15 22:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['job', 'status'], name='task_job_status_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_task_job_status_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(fields=['workflow', 'status', '-created'], name='job_workflow_status_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_job_workflow_status_idx'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='job',
+            name='duration',
+            field=models.BigIntegerField(default=0, help_text='Run time of the job. AFAICT from nf source code, this is in ms'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.30 on 2026-10-15 23:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_job_duration_bigint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='job',
+            index=models.Index(condition=models.Q(('status__in', [0, 10])), fields=['created'], name='job_active_idx'),
+        ),
+    ]
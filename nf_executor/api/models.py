@@ -1,10 +1,10 @@
 from datetime import timedelta
 
 from django.db import models
-from django.db.models import Count
+from django.db.models import Count, Q
 from django.utils import timezone
 
-from .enums import (JobStatus, TaskStatus)
+from .enums import (ACTIVE_JOB_STATUSES, JobStatus, TaskStatus)
 
 from model_utils import FieldTracker
 from model_utils.models import TimeStampedModel
@@ -125,7 +125,8 @@ class Job(TimeStampedModel):
     # TASK TRACKING FIELDS FROM NEXTFLOW (note: `created` and `modified` fields exist in TimeStampedModel)
     started_on = models.DateTimeField(null=True)
     completed_on = models.DateTimeField(null=True)
-    duration = models.IntegerField(
+    duration = models.BigIntegerField(
+        # 32 bit milliseconds would overflow for runs longer than ~24 days
         default=0,
         help_text="Run time of the job. AFAICT from nf source code, this is in ms"
     )
@@ -141,18 +142,30 @@ class Job(TimeStampedModel):
         This can be used as a partial progress indicator, but it's imperfect because NF may not submit some tasks
         until a prior step in the workflow has completed.
         """
-        counts_query = self.task_set.values('status').annotate(count=Count('status'))
+        # One GROUP BY over the (job, status) index; clear any ordering so it can't widen the grouping
+        counts_query = self.task_set.order_by().values_list('status').annotate(count=Count('pk'))
         return {
-            TaskStatus(item['status']).name: item['count']
-            for item in counts_query
+            TaskStatus(status).name: count
+            for status, count in counts_query
         }
 
     def __str__(self):
         return f'{self.pk} - {self.run_id}'
 
-    def save(self, *args, **kwargs):
+    def update_expiry(self) -> bool:
+        """
+        Once a job is resolved, schedule its records for cleanup. Returns True if the expiry date was changed.
+
+        Called on save; bulk writers (which skip `save`) should call this themselves.
+        """
         if self.tracker.has_changed('status') and JobStatus.is_resolved(self.status):
             self.expire_on = timezone.now() + timedelta(days=30)
+            return True
+        return False
+
+    def save(self, *args, **kwargs):
+        if self.update_expiry() and (update_fields := kwargs.get('update_fields')) is not None:
+            kwargs['update_fields'] = {*update_fields, 'expire_on'}
 
         super().save(*args, **kwargs)
 
@@ -164,6 +177,16 @@ class Job(TimeStampedModel):
                 name='IDs are unique per workflow'
             )
         ]
+        indexes = [
+            # The job list is filtered by workflow and status, newest first
+            models.Index(fields=['workflow', 'status', '-created'], name='job_workflow_status_idx'),
+            # Status sweeps only look at active jobs, which are a small (and shrinking) share of the table over time
+            models.Index(
+                fields=['created'],
+                condition=Q(status__in=sorted(s.value for s in ACTIVE_JOB_STATUSES)),
+                name='job_active_idx',
+            ),
+        ]
 
 
 class Task(TimeStampedModel):
@@ -219,6 +242,10 @@ class Task(TimeStampedModel):
                 name='Task per job'
             )
         ]
+        indexes = [
+            # Progress reports count the tasks of one job by status
+            models.Index(fields=['job', 'status'], name='task_job_status_idx'),
+        ]
 
 
 class JobHeartbeat(TimeStampedModel):
@@ -6,7 +6,22 @@ Note that there is no write serializer for tasks, because
 """
 from rest_framework import serializers as drf_serializers
 
-from . import models as api_models
+from . import enums, models as api_models
+
+
+class StatusNameField(drf_serializers.Field):
+    """
+    Read only: render an integer status as its enum name.
+
+    Same output as `get_status_display`, but the name table is built once per field rather than once per row.
+    """
+    def __init__(self, enum, **kwargs):
+        self._names = {member.value: member.name for member in enum}
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return self._names.get(value, value)
 
 
 class WorkflowSerializer(drf_serializers.ModelSerializer):
@@ -16,7 +31,7 @@ class WorkflowSerializer(drf_serializers.ModelSerializer):
 
 
 class JobSerializer(drf_serializers.ModelSerializer):
-    status = drf_serializers.CharField(source='get_status_display', read_only=True)
+    status = StatusNameField(enums.JobStatus)
 
     def validate(self, data):
         # Workaround: Two column unique constraints are not handled properly by DRF
@@ -48,6 +63,15 @@ class JobSerializer(drf_serializers.ModelSerializer):
 
 class JobDetailSerializer(JobSerializer):
     """Detail view includes additional information which is more expensive to calculate"""
+    progress = drf_serializers.SerializerMethodField()
+
+    def get_progress(self, job: api_models.Job) -> dict:
+        # The view may have counted tasks already (eg for an ETag). Don't count them twice.
+        try:
+            return self.context['progress']
+        except KeyError:
+            return job.progress
+
     class Meta(JobSerializer.Meta):
         fields = JobSerializer.Meta.fields + ('progress',)
 
@@ -56,7 +80,7 @@ class TaskSerializer(drf_serializers.ModelSerializer):
     """
     Typically used as read only serializer; tasks are populated via monitor callbacks unique to workflow engine
     """
-    status = drf_serializers.CharField(source='get_status_display', read_only=True)
+    status = StatusNameField(enums.TaskStatus)
 
     class Meta:
         # All fields are marked read only
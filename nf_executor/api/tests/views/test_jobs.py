@@ -1,8 +1,32 @@
+import threading
+from unittest import mock
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import connection, transaction
+from django.db.models import QuerySet
 from django.urls import reverse
-from django.test import TestCase
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.utils.text import get_valid_filename
 
-from ..factories import WorkflowFactory
+from ..factories import JobFactory, TaskFactory, WorkflowFactory
+from nf_executor.api.enums import JobStatus, TaskStatus
 from nf_executor.api.models import Job
+from nf_executor.nextflow.runners.compute.local import SubprocessRunner
+from nf_executor.api.views.jobs import _job_storage_root
+
+
+class TestJobStorageRoot(SimpleTestCase):
+    def test_matches_django_filename_rules(self):
+        for run_id in ('simple', ' with spaces ', 'a/b\\c', '../escape', 'weird$chars!.txt'):
+            self.assertEqual(
+                _job_storage_root(12, run_id),
+                f'12/{get_valid_filename(run_id)}',
+                f'Storage folder for `{run_id}` follows the same rules as django'
+            )
+
+    def test_rejects_unusable_names(self):
+        with self.assertRaises(SuspiciousFileOperation, msg='Run IDs with no usable characters are rejected'):
+            _job_storage_root(12, '..')
 
 
 class TestJobsDetail(TestCase):
@@ -23,3 +47,167 @@ class TestJobsDetail(TestCase):
             0,
             'Job was not created because workflow is not accepting submissions'
         )
+
+
+class TestJobsList(TestCase):
+    def test_filters_by_workflow_and_status(self):
+        workflow = WorkflowFactory()
+        wanted = JobFactory(workflow=workflow, is_started=True)
+        JobFactory(workflow=workflow, is_completed=True)
+        JobFactory(is_started=True)
+
+        url = reverse('apiv1:jobs-list')
+        resp = self.client.get(url, {'workflow': workflow.pk, 'status': wanted.status})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual([r['id'] for r in resp.json()['results']], [wanted.pk], 'Both filters are applied')
+
+    def test_status_is_rendered_by_name(self):
+        job = JobFactory(is_cancel_pending=True)
+
+        resp = self.client.get(reverse('apiv1:jobs-list'))
+
+        self.assertEqual(resp.json()['results'][0]['status'], 'cancel_pending')
+        self.assertEqual(resp.json()['results'][0]['status'], job.get_status_display(), 'Same as model display value')
+
+    def test_query_count_does_not_grow_with_jobs(self):
+        url = reverse('apiv1:jobs-list')
+        JobFactory.create_batch(5)
+
+        # Request savepoint + count + one page of jobs. Workflows are rendered as PKs, so no per-row lookups
+        with self.assertNumQueries(4):
+            self.client.get(url)
+
+
+class TestJobProgress(TestCase):
+    def test_counts_tasks_by_status_name(self):
+        job = JobFactory(is_started=True)
+        TaskFactory.create_batch(2, job=job, is_completed=True)
+        TaskFactory(job=job, is_started=True)
+
+        with self.assertNumQueries(1):
+            progress = job.progress
+
+        self.assertEqual(progress, {'COMPLETED': 2, 'RUNNING': 1})
+
+
+class TestJobsCancel(TestCase):
+    def test_cancel_missing_job(self):
+        url = reverse('apiv1:jobs-detail', kwargs={'pk': 999999})
+        resp = self.client.delete(url)
+        self.assertEqual(resp.status_code, 404, 'Cannot cancel a job that does not exist')
+
+    def test_cancel_resolved_job(self):
+        job = JobFactory(is_completed=True)
+        url = reverse('apiv1:jobs-detail', kwargs={'pk': job.pk})
+        resp = self.client.delete(url)
+        self.assertEqual(resp.status_code, 400, 'Cannot cancel a job that is no longer active')
+
+    def test_cancel_active_job(self):
+        job = JobFactory(is_started=True, job_storage_root='memoized')
+        url = reverse('apiv1:jobs-detail', kwargs={'pk': job.pk})
+
+        # Don't signal a real process: executor IDs from the factory are not ours
+        with mock.patch.object(SubprocessRunner, '_cancel_to_engine', return_value=True) as m:
+            resp = self.client.delete(url)
+
+        self.assertEqual(resp.status_code, 204, 'Active job can be canceled')
+        m.assert_called_once()
+        job.refresh_from_db(fields=['status', 'completed_on'])
+        self.assertEqual(job.status, JobStatus.cancel_pending, 'Cancel is pending until the executor confirms it')
+        self.assertIsNotNone(job.completed_on, 'Accepted cancel records the job end')
+
+    def test_cancel_locked_job_conflicts(self):
+        """SQLite has no row locks: stand in for what SKIP LOCKED returns while another request holds the row"""
+        job = JobFactory(is_started=True, job_storage_root='memoized')
+        url = reverse('apiv1:jobs-detail', kwargs={'pk': job.pk})
+
+        def locked(queryset, **kwargs):
+            self.assertTrue(kwargs.get('skip_locked'), 'Cancel does not wait for a locked row')
+            return queryset.none()
+
+        with mock.patch.object(QuerySet, 'select_for_update', autospec=True, side_effect=locked), \
+                mock.patch.object(SubprocessRunner, '_cancel_to_engine') as m:
+            resp = self.client.delete(url)
+
+        self.assertEqual(resp.status_code, 409, 'A cancel is already in progress')
+        m.assert_not_called()
+        job.refresh_from_db(fields=['status'])
+        self.assertEqual(job.status, JobStatus.started, 'Job is left for the request holding the lock')
+
+
+@skipUnlessDBFeature('has_select_for_update_skip_locked')
+class TestJobsCancelLocking(TransactionTestCase):
+    """Real row locks, with the lock held by another connection"""
+    def test_cancel_locked_job_conflicts(self):
+        job = JobFactory(is_started=True, job_storage_root='memoized')
+        url = reverse('apiv1:jobs-detail', kwargs={'pk': job.pk})
+        locked, release = threading.Event(), threading.Event()
+
+        def hold_lock():
+            try:
+                with transaction.atomic():
+                    Job.objects.select_for_update().get(pk=job.pk)
+                    locked.set()
+                    release.wait(timeout=10)
+            finally:
+                connection.close()
+
+        holder = threading.Thread(target=hold_lock)
+        holder.start()
+        try:
+            self.assertTrue(locked.wait(timeout=10), 'Lock holder is ready')
+            with mock.patch.object(SubprocessRunner, '_cancel_to_engine') as m:
+                resp = self.client.delete(url)
+        finally:
+            release.set()
+            holder.join()
+
+        self.assertEqual(resp.status_code, 409, 'Request does not wait for the lock')
+        m.assert_not_called()
+
+
+class TestJobsConditionalGet(TestCase):
+    def test_unchanged_job_returns_not_modified(self):
+        job = JobFactory(is_started=True)
+        url = reverse('apiv1:jobs-detail', kwargs={'pk': job.pk})
+
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        self.assertIn('ETag', first.headers, 'Detail view reports an ETag')
+
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(second.status_code, 304, 'Unchanged job is not serialized again')
+
+    def test_new_task_changes_etag(self):
+        job = JobFactory(is_started=True)
+        url = reverse('apiv1:jobs-detail', kwargs={'pk': job.pk})
+
+        first = self.client.get(url)
+        TaskFactory(job=job)
+
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(second.status_code, 200, 'Task progress invalidates the cached job')
+        self.assertEqual(sum(second.json()['progress'].values()), 1, 'Response includes the new task')
+
+    def test_task_status_change_changes_etag(self):
+        job = JobFactory(is_started=True)
+        task = TaskFactory(job=job, status=TaskStatus.RUNNING)
+        url = reverse('apiv1:jobs-detail', kwargs={'pk': job.pk})
+
+        first = self.client.get(url)
+        task.status = TaskStatus.COMPLETED
+        task.save()
+
+        second = self.client.get(url, HTTP_IF_NONE_MATCH=first.headers['ETag'])
+        self.assertEqual(second.status_code, 200, 'Task progress invalidates the cached job')
+
+    def test_tasks_are_counted_once(self):
+        job = JobFactory(is_started=True)
+        TaskFactory(job=job)
+        url = reverse('apiv1:jobs-detail', kwargs={'pk': job.pk})
+
+        # Job + task counts, plus the savepoint around the request
+        with self.assertNumQueries(4):
+            resp = self.client.get(url)
+        self.assertEqual(sum(resp.json()['progress'].values()), 1)
@@ -1,8 +1,10 @@
-import os
+import re
 
-from django.utils.text import get_valid_filename
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import transaction
+from django.utils.cache import get_conditional_response, patch_cache_control
 from rest_framework import generics, status
-from rest_framework.exceptions import APIException
+from rest_framework.exceptions import APIException, NotFound
 from rest_framework.response import Response
 
 from nf_executor.api import models, serializers
@@ -11,6 +13,18 @@ from nf_executor.nextflow.runners import get_runner
 from nf_executor.nextflow.util import get_callback_url
 
 
+# Same rules as django's `get_valid_filename`, compiled once rather than on every submission
+_UNSAFE_FILENAME_CHARS = re.compile(r'[^-\w.]')
+
+
+def _job_storage_root(workflow_pk: int, run_id: str) -> str:
+    """Persistent storage folder for a job (relative to the storage root). A job ID is unique *per workflow*"""
+    name = _UNSAFE_FILENAME_CHARS.sub('', run_id.strip().replace(' ', '_'))
+    if name in {'', '.', '..'}:
+        raise SuspiciousFileOperation(f"Could not derive a valid storage folder name from '{run_id}'")
+    return f'{workflow_pk}/{name}'
+
+
 class LockedWorkflowException(APIException):
     status_code = 423
     default_detail = "This workflow is not accepting new job submissions"
@@ -21,7 +35,8 @@ class JobListView(generics.ListCreateAPIView):
     """
     See running jobs (get) or create a new one (post)
     """
-    queryset = models.Job.objects.all()
+    # Internal bookkeeping columns are never shown in the list
+    queryset = models.Job.objects.defer('job_storage_root', 'callback_token', 'executor_id')
     serializer_class = serializers.JobSerializer
 
     ordering = ('-created',)
@@ -40,11 +55,7 @@ class JobListView(generics.ListCreateAPIView):
             raise LockedWorkflowException
 
         # Assign persistent logging directory. A job ID is unique *per workflow*
-        safe_path = os.path.join(
-            str(data["workflow"].pk),
-            get_valid_filename(data["run_id"])
-        )
-        data['job_storage_root'] = safe_path
+        data['job_storage_root'] = _job_storage_root(data["workflow"].pk, data["run_id"])
 
         # First save: record work requested by user. The executor will save again once work has been scheduled.
         job = serializer.save()
@@ -78,12 +89,46 @@ class JobDetailView(generics.RetrieveDestroyAPIView):
             runner.reconcile_job_status(save=True)
         return job
 
-    def delete(self, request, *args, **kwargs):
-        """Keep the model, but allow the runner engine to stop job and mark it canceled"""
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Job status is often polled by dashboards. Support conditional requests (ETag) so that a poller can skip
+            serialization of a job that has not changed since the last check.
+        """
         job = self.get_object()
-        if not JobStatus.is_active(job):
-            return Response(status=status.HTTP_400_BAD_REQUEST)
+        progress = job.progress  # Counted once: used by both the ETag and the response body
+        etag = self._get_etag(job, progress)
 
-        runner = get_runner(job)
-        runner.cancel()
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            context = {**self.get_serializer_context(), 'progress': progress}
+            response = Response(self.get_serializer(job, context=context).data)
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=2)
+        return response
+
+    def _get_etag(self, job: models.Job, progress: dict) -> str:
+        """Job progress comes from task records, which are saved separately from the job itself"""
+        counts = ','.join(f'{name}:{count}' for name, count in sorted(progress.items()))
+        return f'W/"{job.pk}-{job.modified.timestamp()}-{counts}"'
+
+    def delete(self, request, *args, **kwargs):
+        """
+        Keep the model, but allow the runner engine to stop job and mark it canceled
+
+        The job row is locked while the cancel signal is sent. A concurrent cancel request for the same job does not
+            wait for the lock: it is told that a cancel is already in progress.
+        """
+        with transaction.atomic():
+            job = self.get_queryset().select_for_update(skip_locked=True).filter(pk=self.kwargs['pk']).first()
+            if job is None:
+                if not self.get_queryset().filter(pk=self.kwargs['pk']).exists():
+                    raise NotFound
+                return Response(status=status.HTTP_409_CONFLICT)
+
+            if not JobStatus.is_active(job.status):
+                return Response(status=status.HTTP_400_BAD_REQUEST)
+
+            runner = get_runner(job)
+            runner.cancel()
         return Response(status=status.HTTP_204_NO_CONTENT)
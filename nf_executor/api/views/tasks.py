@@ -17,7 +17,8 @@ class TaskListView(generics.ListAPIView):
     def get_queryset(self):
         job_id = self.kwargs['job_id']
         try:
-            job = models.Job.objects.get(pk=job_id)
+            # Only used to scope the list, so don't load the (possibly large) job params
+            job = models.Job.objects.only('id').get(pk=job_id)
         except models.Job.DoesNotExist:
             raise NotFound('Specified job ID does not exist')
 
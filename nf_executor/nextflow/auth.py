@@ -3,19 +3,26 @@ Simplistic authentication for callback endpoints such as Nextflow "weblog via ht
   (which does not support headers, cookies, etc)
 
 This module relies on relatively weak encryption algorithms because we check a password-analogue token on every request
-    and expect to process many events, continuously
+    and expect to process many events, continuously. Nonces are long random values (not user-chosen passwords), so a
+    single fast hash is enough to keep them from being recovered from the DB; no key stretching is needed.
 
 The primary use of this is to prevent against nonces being leaked via the DB. There are other compensating controls,
   such as auth being ignored once a job is marked complete for more than 1 day.
 """
 import datetime
+import hashlib
+import hmac
 
 import bcrypt
 from django.utils import timezone
 
 
-def gen_password(base: bytes):
-    return bcrypt.hashpw(base, bcrypt.gensalt())
+# Tokens issued before the switch to sha256 were bcrypt hashes (always 60 bytes)
+_BCRYPT_HASH_LENGTH = 60
+
+
+def gen_password(base: bytes) -> bytes:
+    return hashlib.sha256(base).digest()
 
 
 def check_password(provided, actual, expire_time: 'datetime.datetime' = None) -> bool:
@@ -26,4 +33,8 @@ def check_password(provided, actual, expire_time: 'datetime.datetime' = None) ->
     if isinstance(provided, str):
         provided = bytes.fromhex(provided)
 
-    return bcrypt.checkpw(provided, actual)
+    actual = bytes(actual)  # Some DB backends return binary fields as memoryview
+    if len(actual) == _BCRYPT_HASH_LENGTH:
+        return bcrypt.checkpw(provided, actual)
+
+    return hmac.compare_digest(hashlib.sha256(provided).digest(), actual)
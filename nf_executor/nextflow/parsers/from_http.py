@@ -7,9 +7,11 @@ TODO: In the future, we want to use the same data container logic for both HTTP
     the event data available is so different that this is hard to reconcile right now.
 """
 from datetime import datetime
-import json
 import typing as ty
 
+from django.utils import timezone
+import orjson
+
 from nf_executor.api import enums, models
 from nf_executor.nextflow.exceptions import UnknownEventException
 
@@ -72,15 +74,44 @@ def job_completed(job: models.Job, payload: dict) -> models.Job:
     return job
 
 
+def _find_task(job: models.Job, task_id) -> models.Task:
+    """
+    Find the record for a task event, or build a new one if this is the first event seen for that task.
+
+    A new task is not saved here: it is inserted once, when the caller saves the parsed record.
+    """
+    try:
+        return models.Task.objects.get(job=job, task_id=task_id)
+    except models.Task.DoesNotExist:
+        return models.Task(job=job, task_id=task_id)
+
+
 def task_submit(job: models.Job, payload: dict) -> models.Task:
     """
     Create a task record when a process is submitted.
 
     Handle possible race condition where later events handled first.
     """
+    task = _find_task(job, payload['trace']['task_id'])
+    return _apply_task_submit(task, payload)
+
+
+def task_start(job: models.Job, payload: dict) -> models.Task:
+    """Update a task record once a task starts"""
+    task = _find_task(job, payload['trace']['task_id'])
+    return _apply_task_start(task, payload)
+
+
+def task_complete(job: models.Job, payload: dict) -> models.Task:
+    """
+    Update a task record once a task completes. Completion *does not* mean success.
+    """
+    task = _find_task(job, payload['trace']['task_id'])
+    return _apply_task_complete(task, payload)
+
+
+def _apply_task_submit(task: models.Task, payload: dict) -> models.Task:
     metadata = payload['trace']
-    task_id = metadata['task_id']
-    task, _ = models.Task.objects.get_or_create(job=job, task_id=task_id)
 
     # Submission event is always the source of truth for these fields
     task.submitted_on = parse_time(payload)
@@ -92,11 +123,8 @@ def task_submit(job: models.Job, payload: dict) -> models.Task:
     return task
 
 
-def task_start(job: models.Job, payload: dict) -> models.Task:
-    """Update a task record once a task starts"""
+def _apply_task_start(task: models.Task, payload: dict) -> models.Task:
     metadata = payload['trace']
-    task_id = metadata['task_id']
-    task, _ = models.Task.objects.get_or_create(job=job, task_id=task_id)
 
     # Start event is always the source of truth for these fields
     # TODO Characterize best way to dedup task restarts: is a new native ID issues? Are names unique?
@@ -109,13 +137,8 @@ def task_start(job: models.Job, payload: dict) -> models.Task:
     return task
 
 
-def task_complete(job: models.Job, payload: dict) -> models.Task:
-    """
-    Update a task record once a task completes. Completion *does not* mean success.
-    """
+def _apply_task_complete(task: models.Task, payload: dict) -> models.Task:
     metadata = payload['trace']
-    task_id = metadata['task_id']
-    task, _ = models.Task.objects.get_or_create(job=job, task_id=task_id)
 
     # Completion event is always the source of truth for these fields
     task.completed_on = parse_time(payload)
@@ -128,27 +151,99 @@ def task_complete(job: models.Job, payload: dict) -> models.Task:
     return task
 
 
-def parse_event(job: models.Job, payload: ty.Union[str, dict]) -> ty.Union[models.Task, models.Job]:
-    """Map an event name (from NF as string) into a Job or Task record, as appropriate"""
-    known_events = {
-        # According to NF doc defined enumeration, http events are fixed constants
-        # Job events
-        'started': job_started,
-        'error': job_error,
-        'completed': job_completed,
-        # Task events
-        'process_submitted': task_submit,
-        'process_started': task_start,
-        'process_completed': task_complete,
-    }
+# According to NF doc defined enumeration, http events are fixed constants
+_EVENT_PARSERS = {
+    # Job events
+    'started': job_started,
+    'error': job_error,
+    'completed': job_completed,
+    # Task events
+    'process_submitted': task_submit,
+    'process_started': task_start,
+    'process_completed': task_complete,
+}
+
+_TASK_EVENT_APPLIERS = {
+    'process_submitted': _apply_task_submit,
+    'process_started': _apply_task_start,
+    'process_completed': _apply_task_complete,
+}
 
+
+def parse_event(job: models.Job, payload: ty.Union[str, bytes, dict]) -> ty.Union[models.Task, models.Job]:
+    """Map an event name (from NF as string) into a Job or Task record, as appropriate"""
     if isinstance(payload, (str, bytes)):
-        payload = json.loads(payload)
+        payload = orjson.loads(payload)
 
     name = payload['event']
-    try:
-        parser = known_events[name]
-    except KeyError:
+    parser = _EVENT_PARSERS.get(name)
+    if parser is None:
         raise UnknownEventException(f"Unrecognized nextflow event type: `{name}`")
 
     return parser(job, payload)
+
+
+# Fields written by task events. Used to upsert a batch of tasks at once.
+_TASK_EVENT_FIELDS = [
+    'name', 'status', 'native_id', 'exit_code', 'submitted_on', 'started_on', 'completed_on', 'modified',
+]
+
+
+def _apply_task_events(task: models.Task, events: list[dict]) -> models.Task:
+    for payload in events:
+        task = _TASK_EVENT_APPLIERS[payload['event']](task, payload)
+    return task
+
+
+def parse_events_bulk(job: models.Job, payloads: ty.Iterable[ty.Union[str, dict]]) -> list[models.Task]:
+    """
+    Record a batch of events for one job (eg a replayed or buffered event stream), with a fixed number of queries.
+
+    Events for the same task are combined in memory, so each task is written once. Unlike `parse_event`, the
+        records are saved here: the job (if any job event was seen), and all tasks in bulk.
+    """
+    payloads = [
+        orjson.loads(payload) if isinstance(payload, (str, bytes)) else payload
+        for payload in payloads
+    ]
+
+    events_by_task: dict[str, list[dict]] = {}
+    job_changed = False
+    for payload in payloads:
+        if payload['event'] in _TASK_EVENT_APPLIERS:
+            events_by_task.setdefault(str(payload['trace']['task_id']), []).append(payload)
+        else:
+            parse_event(job, payload)
+            job_changed = True
+
+    if job_changed:
+        job.save()
+
+    existing = {
+        task.task_id: task
+        for task in models.Task.objects.filter(job=job, task_id__in=events_by_task)
+    }
+
+    now = timezone.now()
+    to_update, to_create = [], []
+    for task_id, events in events_by_task.items():
+        task = _apply_task_events(existing.get(task_id) or models.Task(job=job, task_id=task_id), events)
+        task.modified = now
+        (to_update if task.pk else to_create).append(task)
+
+    if to_update:
+        models.Task.objects.bulk_update(to_update, _TASK_EVENT_FIELDS)
+    if to_create:
+        # Another writer may have created some of these tasks since we looked, possibly with newer information. Insert
+        #   what is new, then replay this batch's events on top of the stored rows: the usual rules (eg status only
+        #   moves forward) then hold no matter which writer got there first.
+        models.Task.objects.bulk_create(to_create, ignore_conflicts=True)
+        to_create = [
+            _apply_task_events(task, events_by_task[task.task_id])
+            for task in models.Task.objects.filter(job=job, task_id__in=[t.task_id for t in to_create])
+        ]
+        for task in to_create:
+            task.modified = now
+        models.Task.objects.bulk_update(to_create, _TASK_EVENT_FIELDS)
+
+    return to_update + to_create
@@ -4,12 +4,18 @@ Parse various types of tracelog events from Nextflow
 These parsers are used for event reconciliation, and hence they populate a data container rather than a model
 """
 import collections
-import dataclasses as dc
+import csv
+import io
+import types
+import typing as ty
 from datetime import datetime
 
 from nf_executor.api import enums
 from nf_executor.nextflow.exceptions import TaskStateException
 
+# Plain name -> member mapping: skips the Enum metaclass lookup for every parsed row
+_STATUS_BY_NAME = enums.TaskStatus.__members__
+
 
 def parse_none(value, as_type=None):
     """Nextflow trace file uses `-` as a placeholder when no value was provided"""
@@ -21,73 +27,200 @@ def parse_none(value, as_type=None):
     return value
 
 
-@dc.dataclass
+def _int_or_none(value):
+    """Specialized `parse_none(value, as_type=int)` for the per-row hot path"""
+    return None if value == '-' else int(value)
+
+
+def _float_or_none(value):
+    """Specialized `parse_none(value, as_type=float)` for the per-row hot path"""
+    return None if value == '-' else float(value)
+
+
+def _parse_submit(value):
+    return datetime.fromisoformat(value)
+
+
+class _LazyColumn:
+    """
+    A typed trace column, kept as raw text until first read. Converted once, then stored back in place of the text.
+
+    Status checks only ever look at task name + status, so most rows never need their other columns parsed.
+    """
+    def __init__(self, convert):
+        self._convert = convert
+        self._slot = None
+
+    def __set_name__(self, owner, name):
+        self._slot = f'_{name}'
+
+    def __get__(self, obj, objtype=None):
+        if obj is None:
+            return self
+        value = getattr(obj, self._slot)
+        if isinstance(value, str):
+            value = self._convert(value)
+            setattr(obj, self._slot, value)
+        return value
+
+    def __set__(self, obj, value):
+        setattr(obj, self._slot, value)
+
+
 class NFTraceEvent:
-    task_id: str
-    hash: str
-    native_id: str
-    name: str
-    status: enums.TaskStatus
-    exit_code: int
-    submit: datetime
-    duration: str  # reported with a human suffix
-    realtime: str
-    pct_cpu: float
-    peak_rss: float
-    peak_vmem: float
-    rchar: int
-    wchar: int
-
-    def __post_init__(self):
-        """Clean up datatypes where parsing is needed"""
-        self.exit_code = parse_none(self.exit_code, as_type=int)
-        self.submit = datetime.fromisoformat(self.submit)  # type: ignore
-        self.status = enums.TaskStatus[self.status]  # type: ignore
-
-        self.pct_cpu = parse_none(self.pct_cpu, as_type=float)
-        self.peak_rss = parse_none(self.peak_rss, as_type=float)
-        self.peak_vmem = parse_none(self.peak_vmem, as_type=float)
-        self.rchar = parse_none(self.rchar, as_type=int)
-        self.wchar = parse_none(self.wchar, as_type=int)
+    """One row of a nextflow trace file"""
+    __slots__ = (
+        'task_id', 'hash', 'native_id', 'name', 'status', '_exit_code', '_submit', 'duration', 'realtime',
+        '_pct_cpu', '_peak_rss', '_peak_vmem', '_rchar', '_wchar',
+    )
+
+    exit_code: int = _LazyColumn(_int_or_none)
+    submit: datetime = _LazyColumn(_parse_submit)
+    pct_cpu: float = _LazyColumn(_float_or_none)
+    peak_rss: float = _LazyColumn(_float_or_none)
+    peak_vmem: float = _LazyColumn(_float_or_none)
+    rchar: int = _LazyColumn(_int_or_none)
+    wchar: int = _LazyColumn(_int_or_none)
+
+    def __init__(
+            self,
+            task_id: str,
+            hash: str,
+            native_id: str,
+            name: str,
+            status: str,
+            exit_code,
+            submit,
+            duration: str,  # reported with a human suffix
+            realtime: str,
+            pct_cpu,
+            peak_rss,
+            peak_vmem,
+            rchar,
+            wchar,
+    ):
+        self.task_id = task_id
+        self.hash = hash
+        self.native_id = native_id
+        self.name = name
+        self.status: enums.TaskStatus = _STATUS_BY_NAME[status]  # Always needed: parse up front
+        self.exit_code = exit_code
+        self.submit = submit
+        self.duration = duration
+        self.realtime = realtime
+        self.pct_cpu = pct_cpu
+        self.peak_rss = peak_rss
+        self.peak_vmem = peak_vmem
+        self.rchar = rchar
+        self.wchar = wchar
+
+    def __repr__(self):
+        return f'{type(self).__name__}(task_id={self.task_id!r}, name={self.name!r}, status={self.status!r})'
 
     # def fill_model(self, task):
     #     pass
 
 
-class TraceList(collections.UserList):
+# Aggregate task states for a (consolidated) trace, gathered in a single scan
+TraceSummary = collections.namedtuple(
+    'TraceSummary',
+    ['has_aborted', 'has_failed', 'all_completed', 'max_running', 'max_error']
+)
+
+
+class TraceList:
+    """
+    An ordered sequence of trace events, with helpers that summarize task state.
+
+    Wraps a plain list rather than subclassing one: only a few list operations are needed, and each one that edits
+        the contents must also discard the cached views below.
+    """
+    __class_getitem__ = classmethod(types.GenericAlias)
+
+    def __init__(self, items: ty.Iterable[NFTraceEvent] = ()):
+        self._data = list(items)
+        self._consolidated = None  # Status checks all start from the consolidated view: compute it once
+        self._summary = None
+
+    def __len__(self):
+        return len(self._data)
+
+    def __iter__(self):
+        return iter(self._data)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return TraceList(self._data[i])
+        return self._data[i]
+
+    def __delitem__(self, i):
+        del self._data[i]
+        self._changed()
+
+    def __repr__(self):
+        return f'{type(self).__name__}({self._data!r})'
+
+    def append(self, item: NFTraceEvent):
+        self._data.append(item)
+        self._changed()
+
+    def _changed(self):
+        """Contents were edited: cached views will be rebuilt on next use"""
+        self._consolidated = None
+        self._summary = None
+
     def consolidate(self):
-        final = {}
-        for item in self.data:
-            prev = final.get(item.name)  # WARNING: ASSUMES name is unique per task; IDs are new per retry of same task
-            if not prev or (item.status >= prev.status):
-                final[item.name] = item
-        return TraceList(final.values())
+        if self._consolidated is None:
+            final = {}
+            for item in self._data:
+                # WARNING: ASSUMES name is unique per task; IDs are new per retry of same task
+                name = item.name
+                prev = final.get(name)
+                # On ties, the later row wins. (so don't replace this with a sort by status)
+                if prev is None or item.status >= prev.status:
+                    final[name] = item
+            self._consolidated = TraceList(final.values())
+        return self._consolidated
+
+    def summarize(self) -> TraceSummary:
+        """Scan the consolidated task list once, and record every aggregate that the status helpers need"""
+        if self._summary is None:
+            has_aborted = has_failed = False
+            all_completed = True
+            max_running = max_error = None
+            for item in self.consolidate():
+                status = item.status
+                if status == enums.TaskStatus.COMPLETED:
+                    continue
+
+                all_completed = False
+                if status <= enums.TaskStatus.RUNNING:
+                    if max_running is None or status > max_running:
+                        max_running = status
+                else:
+                    # Note: May include retries-in-progress
+                    has_aborted = has_aborted or status == enums.TaskStatus.ABORTED
+                    has_failed = has_failed or status == enums.TaskStatus.FAILED
+                    if max_error is None or status > max_error:
+                        max_error = status
+
+            self._summary = TraceSummary(has_aborted, has_failed, all_completed, max_running, max_error)
+        return self._summary
 
     def any_aborted(self):
         """
         Did any tasks report abort as the last/highest state?
         (This can mean either that one task hard failed, OR that the whole job was canceled)
         """
-        return any(
-            i.status == enums.TaskStatus.ABORTED for
-            i in self.consolidate()
-        )
+        return self.summarize().has_aborted
 
     def any_failed(self):
         """Did any tasks report failure as the last/highest state?"""
-        return any(
-            i.status == enums.TaskStatus.FAILED
-            for i in self.consolidate()
-        )
+        return self.summarize().has_failed
 
-    def all_complete(self, items=None):
+    def all_complete(self):
         """Do all tasks report success as the last/highest state?"""
-        if not items:
-            items = self.consolidate()
-        return all(
-            i.status == enums.TaskStatus.COMPLETED
-            for i in items
-        )
+        return self.summarize().all_completed
 
     def final_status(self):
         """
@@ -96,37 +229,34 @@ class TraceList(collections.UserList):
         There may be cases where task status != job status, eg if nextflow crashed halfway through. Combine the output
             of this method with other info (from the job runner) as needed.
         """
-        items = self.consolidate()
-        if self.all_complete(items):
+        summary = self.summarize()
+        if summary.all_completed:
             return enums.TaskStatus.COMPLETED
 
         # If not all tasks are complete, then they are either running or they failed.
         # It's possible that failures just mean a retry was scheduled: this only reports final task status
-        running = [i.status for i in items if i.status <= enums.TaskStatus.RUNNING]
-        errs = [
-            i.status for i in items
-            if enums.TaskStatus.RUNNING < i.status <= enums.TaskStatus.FAILED  # Note: May include retries-in-progress
-        ]
-
-        if len(running):
-            return max(running)
+        if summary.max_running is not None:
+            return summary.max_running
 
         # If nothing is running or planned, assume the final status is the error state
-        if len(errs):
-            return max(errs)
+        if summary.max_error is not None:
+            return summary.max_error
 
         # If not completed, nothing is running, and no errors: What gives? Assume that trace files are never empty.
         raise TaskStateException('Trace file cannot be resolved to determine job state')
 
 
-def parse_tracelog(raw_content: str) -> TraceList[NFTraceEvent]:
+def parse_tracelog(raw_content: ty.Union[str, ty.Iterable[str]]) -> TraceList[NFTraceEvent]:
     """
     Parse a nextflow tracelog into data tuples.
 
-    Optionally, can consolidate the event stream so that only the last reported status (assumed rank ordering)
-        is returned. This is useful when reconciling newest DB state with tracelog.
+    Accepts either the full file contents, or any iterable of lines (such as an open file). Passing a file streams
+        the parse, so that a large trace never needs to be held in memory as one string.
     """
-    return TraceList(
-        NFTraceEvent(*line.strip().split('\t'))
-        for line in raw_content.splitlines()[1:]  # Ignore header row present in trace file format
-    )
+    if isinstance(raw_content, str):
+        raw_content = io.StringIO(raw_content)
+
+    # Tokenize with the C csv reader. Trace files are plain TSV: quote characters in task names are literal.
+    reader = csv.reader(raw_content, delimiter='\t', quoting=csv.QUOTE_NONE)
+    next(reader, None)  # Ignore header row present in trace file format
+    return TraceList(NFTraceEvent(*row) for row in reader if row)
@@ -1,14 +1,23 @@
 import importlib
+import itertools
+import logging
 import sys
+import typing as ty
 
 from django.conf import settings
+from django.utils import timezone
 
 
+from nf_executor.api.enums import RESOLVED_JOB_STATUSES, JobStatus
 from nf_executor.api.models import Job
+from .compute.aws_batch import AWSBatchRunner
 from .compute.base import AbstractRunner
 from .storage.base import AbstractJobStorage
 
 
+logger = logging.getLogger(__name__)
+
+
 def _get_class_from_string(path: str):
     """h/t: django internals"""
     mp, clp = path.rsplit('.', maxsplit=1)
@@ -18,14 +27,74 @@ def _get_class_from_string(path: str):
 
 
 def get_runner(job: Job, *args, **kwargs) -> AbstractRunner:
-    """Get a compute executor for the designated workflow"""
+    """
+    Get a compute executor for the designated workflow
+
+    The default runner is memoized on the job instance, so that several calls within one request (eg submit, then
+     check status) don't rebuild storage and engine clients. Custom options always build a fresh runner.
+    """
+    use_cache = not args and not kwargs
+    if use_cache and (runner := getattr(job, '_runner', None)) is not None:
+        return runner
+
     storage = get_storage(job.job_storage_root, *args, **kwargs)
-    return _CC(
+    runner = _CC(
         job,
         storage,
         *args,
         **kwargs
     )
+    if use_cache:
+        job._runner = runner
+    return runner
+
+
+def reconcile_jobs(jobs: ty.Iterable[Job], batch_size: int = 500) -> list[Job]:
+    """
+    Reconcile the status of many jobs at once (eg a periodic sweep of active jobs). Returns the jobs that changed.
+
+    Each job is checked against its executor as usual, but all status changes are written in batched UPDATEs, rather
+     than one save per job. Executors that can look up many jobs in one call (AWS batch) are asked once per batch.
+
+    To sweep active jobs, select them with `status__in=ACTIVE_JOB_STATUSES` (served by a partial index).
+    """
+    changed = []
+    now = timezone.now()
+    jobs = iter(jobs)
+    while batch := list(itertools.islice(jobs, batch_size)):
+        run_states = _bulk_run_states(batch)
+        for job in batch:
+            run_state = None
+            if run_states is not None and job.status not in RESOLVED_JOB_STATUSES:
+                run_state = run_states.get(job.executor_id)
+                if run_state is None:
+                    # The executor lookup failed: that says nothing about the job, so leave it for the next sweep
+                    continue
+
+            actual, is_ok = get_runner(job).reconcile_job_status(save=False, run_state=run_state)
+            if is_ok:
+                continue
+
+            logger.warning(f"Job status conflict for {job.run_id}. Will update from {job.status} to {actual}")
+            job.status = actual
+            job.update_expiry()
+            job.modified = now  # bulk_update doesn't apply auto-now fields
+            changed.append(job)
+
+    Job.objects.bulk_update(changed, ['status', 'expire_on', 'modified'], batch_size=batch_size)
+    return changed
+
+
+def _bulk_run_states(jobs: list[Job]) -> ty.Optional[dict[str, JobStatus]]:
+    """
+    Executor status of unresolved jobs, by executor ID, for executors that can check many jobs in one call.
+        Returns None if the executor checks one job at a time.
+    """
+    if not issubclass(_CC, AWSBatchRunner):
+        return None
+
+    arns = {job.executor_id for job in jobs if job.executor_id and job.status not in RESOLVED_JOB_STATUSES}
+    return _CC.bulk_query_remote_state(arns)
 
 
 def get_storage(job_root: str, root=settings.NF_EXECUTOR['STORAGE_ROOT'], *args, **kwargs) -> AbstractJobStorage:
@@ -1,7 +1,10 @@
 """
 Executor that submits jobs to AWS batch and checks on status
 """
+from functools import cached_property
 import logging
+import typing as ty
+
 import botocore.exceptions
 import boto3
 
@@ -13,13 +16,20 @@ from nf_executor.nextflow.exceptions import JobStateException, InvalidRunnerExce
 
 logger = logging.getLogger(__name__)
 
+# Max job IDs accepted by a single batch `describe_jobs` call
+DESCRIBE_JOBS_LIMIT = 100
 
-def find_first(iterable, predicate=lambda x: False):
-    """Find first item in the list that matches the predicate. Return None if no match found."""
-    for item in iterable:
-        if predicate(item):
-            return item
-    return None
+# enum ref:
+#   https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/batch/client/describe_jobs.html
+BATCH_STATUS_MAP = {
+    'SUCCEEDED': JobStatus.completed,
+    'FAILED': JobStatus.error,
+    'SUBMITTED': JobStatus.submitted,
+    'PENDING': JobStatus.submitted,
+    'RUNNABLE': JobStatus.submitted,
+    'STARTING': JobStatus.started,
+    'RUNNING': JobStatus.started,
+}
 
 
 # https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/batch/client/submit_job.html
@@ -46,6 +56,14 @@ class AWSBatchRunner(AbstractRunner):
         # The AWS batch job definition that defines how to run nextflow. (using a special container def for this project)
         self._head_def_arn = self._config['HEAD_DEF_ARN']
 
+    @cached_property
+    def _client(self):
+        """
+        One batch client per runner: building a client (credential + endpoint resolution) is slow relative to a call.
+        Created lazily so that the client is never shared across a fork.
+        """
+        return boto3.client('batch')  # Gets credentials (incl STS) via instance IAM role, else hard fail
+
     def _submit_to_engine(self, callback_url: str, *args, **kwargs) -> str:
         """
         Submit workflow to engine: run the nextflow process as an AWS batch job that in turn spawns other batch jobs.
@@ -75,7 +93,7 @@ class AWSBatchRunner(AbstractRunner):
             # WF options
             "ParamsFile": self._params_fn(job.run_id),
         }
-        client = boto3.client('batch')  # Gets credentials (incl STS) via instance IAM role, else hard fail
+        client = self._client
         result = client.submit_job(
             # Dev note: shows `botocore.errorfactory.ClientException` using nonexistent job definition etc.
             jobName=job.run_id,
@@ -102,7 +120,7 @@ class AWSBatchRunner(AbstractRunner):
             )
             return False
 
-        client = boto3.client('batch')  # Gets credentials (incl STS) via instance IAM role, else hard fail
+        client = self._client
         # Will terminate for running jobs, and cancel for queued jobs (per docs)
         #   https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/batch/client/terminate_job.html
         result = client.terminate_job(
@@ -114,39 +132,45 @@ class AWSBatchRunner(AbstractRunner):
         status = result['ResponseMetadata']['HTTPStatusCode']
         return status == 200
 
-    def _check_run_state(self) -> JobStatus:
-        job = self._job
-        arn = job.executor_id
-
-        client = boto3.client('batch')  # Gets credentials (incl STS) via instance IAM role, else hard fail
+    @classmethod
+    def bulk_query_remote_state(cls, arns: ty.Iterable[str], client=None) -> dict[str, JobStatus]:
+        """
+        Check the state of several batch jobs at once, using one `describe_jobs` call per 100 ARNs (the API limit)
+            instead of one call per job. Useful for polling many active jobs.
 
+        Jobs that batch has no record of are reported as unknown. If a lookup fails (eg throttling), those ARNs are
+            left out of the result entirely: a failed call says nothing about the job, so callers should skip it.
+        """
+        arns = list(arns)
+        client = client or boto3.client('batch')  # Gets credentials (incl STS) via instance IAM role, else hard fail
+
+        described = []
+        found = {}
+        for i in range(0, len(arns), DESCRIBE_JOBS_LIMIT):
+            chunk = arns[i:i + DESCRIBE_JOBS_LIMIT]
+            try:
+                job_status_payload = client.describe_jobs(jobs=chunk)
+            except botocore.exceptions.ClientError:
+                logger.exception('Could not look up the status of %s AWS batch jobs', len(chunk))
+                continue
+
+            described.extend(chunk)
+            # If job doesn't exist, it is simply missing from the payload's jobs array
+            for job_record in job_status_payload['jobs']:
+                found[job_record['jobArn']] = cls._batch_status_to_job(job_record['status'])
+
+        # Batch retains records for ~7 days post execution. Very old jobs may always be unresolvable.
+        return {arn: found.get(arn, JobStatus.unknown) for arn in described}
+
+    @staticmethod
+    def _batch_status_to_job(status: str) -> JobStatus:
         try:
-            job_status_payload = client.describe_jobs(jobs=[arn])
-        except botocore.exceptions.ClientError:
-            return JobStatus.unknown
-
-        job_record = find_first(
-            # If job doesn't exist, we receive a normal payload with 0 length jobs array
-            job_status_payload['jobs'],
-            lambda item: item['jobArn'] == arn
-        )
-
-        if job_record is None:
-            # Batch retains records for ~7 days post execution. Very old jobs may always be unresolvable.
-            return JobStatus.unknown
-
-        status = job_record['status']
-
-        # enum ref:
-        #   https://boto3.amazonaws.com/v1/documentation/api/latest/reference/services/batch/client/describe_jobs.html
-        if status == 'SUCCEEDED':
-            return JobStatus.completed
-        elif status == 'FAILED':
-            return JobStatus.error
-        elif status in {'SUBMITTED', 'PENDING', 'RUNNABLE'}:
-            return JobStatus.submitted
-        elif status in {'STARTING', 'RUNNING'}:
-            return JobStatus.started
-        else:
+            return BATCH_STATUS_MAP[status]
+        except KeyError:
             # If the batch integration has changed, this method must hard-fail
-            raise JobStateException
+            raise JobStateException(f'Unrecognized AWS batch job status: {status}')
+
+    def _check_run_state(self) -> JobStatus:
+        arn = self._job.executor_id
+        # A single job has nothing else to go on if the lookup fails, so fall back to the trace file
+        return self.bulk_query_remote_state([arn], client=self._client).get(arn, JobStatus.unknown)
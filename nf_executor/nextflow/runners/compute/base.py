@@ -1,23 +1,27 @@
 import abc
+import csv
 import dataclasses as dc
-import json
 import logging
 import typing as ty
 
 from django.conf import settings
+from django.db import transaction
 from django.utils import timezone
-
+import orjson
 
 from nf_executor.api import enums, models
 from nf_executor.api.enums import JobStatus
 from nf_executor.api.models import Job
 
 from nf_executor.nextflow import exceptions as exc
-from nf_executor.nextflow.parsers.from_trace import parse_tracelog
+from nf_executor.nextflow.parsers.from_trace import TraceList, parse_tracelog
 from nf_executor.nextflow.runners.storage.base import AbstractJobStorage
 
 logger = logging.getLogger(__name__)
 
+# Trace files are large files of small rows: read them in big chunks to cut down on read syscalls
+TRACE_READ_BUFFER = 1 << 20
+
 
 @dc.dataclass
 class TaskCounter:
@@ -47,12 +51,17 @@ class AbstractRunner(abc.ABC):
             self,
             job: Job,
             storage: AbstractJobStorage,
-            config=settings.NF_EXECUTOR.get(CONFIG_KEY, {}),
+            config=None,
             *args,
             **kwargs
     ):
         self._job = job
         self._stable_storage = storage  # Persistent files like job config files and logs: exist before and after job
+        self._paths = {}  # Validated storage paths, by path segments. See `_relative`
+
+        # Engine config is keyed by subclass. (a default argument value here would only ever see the base CONFIG_KEY)
+        if config is None:
+            config = settings.NF_EXECUTOR.get(self.CONFIG_KEY, {})
         self._config = config
 
     ##########
@@ -73,11 +82,19 @@ class AbstractRunner(abc.ABC):
         if not job.workflow:
             raise exc.BadJobException('Job must specify a valid workflow definition in order to run')
 
-        if job.status != enums.JobStatus.submitted:
-            # Restarts *must* be represented as a new job object, to avoid conflicting records of task events
-            # Please don't try to be clever by just editing one field to bypass this.
-            raise exc.StaleJobException
+        # Hold the job row until submission is recorded, so that two concurrent runs can't both reach the engine.
+        #  Checks read the locked row, not this (possibly outdated) instance. A job that already has an executor ID
+        #  was handed to the engine, even though its status stays "submitted" until nextflow reports in.
+        with transaction.atomic():
+            current = models.Job.objects.select_for_update().only('status', 'executor_id').get(pk=job.pk)
+            if current.status != enums.JobStatus.submitted or current.executor_id:
+                # Restarts *must* be represented as a new job object, to avoid conflicting records of task events
+                # Please don't try to be clever by just editing one field to bypass this.
+                raise exc.StaleJobException
+
+            return self._run_locked(job, params, callback_url, *args, **kwargs)
 
+    def _run_locked(self, job: models.Job, params: dict, callback_url, *args, **kwargs) -> models.Job:
         try:
             self._write_params(job, params)
             params_ok = True
@@ -89,7 +106,7 @@ class AbstractRunner(abc.ABC):
         if not params_ok:
             # This may be a canary for unreachable working directory, so we shouldn't allow the job to proceed.
             job.status = enums.JobStatus.error
-            job.save()
+            job.save(update_fields=['status'])
             return job
 
         try:
@@ -99,7 +116,8 @@ class AbstractRunner(abc.ABC):
             logger.exception("Error while submitting job %s", job.run_id)
             job.status = enums.JobStatus.error
 
-        job.save()  # Second save: record work scheduled by system, incl result of attempts to schedule job
+        # Second save: record work scheduled by system, incl result of attempts to schedule job
+        job.save(update_fields=['status', 'executor_id'])
         return job
 
     def check_job_status(self, job: models.Job, force=False) -> enums.JobStatus:
@@ -113,17 +131,21 @@ class AbstractRunner(abc.ABC):
         else:
             return self._query_local_state()
 
-    def reconcile_job_status(self, save=True) -> ty.Tuple[enums.JobStatus, bool]:
-        """Check job status, and force updates to the DB as needed"""
+    def reconcile_job_status(self, save=True, run_state: JobStatus = None) -> ty.Tuple[enums.JobStatus, bool]:
+        """
+        Check job status, and force updates to the DB as needed
+
+        `run_state` is the executor status of the job if already known (eg looked up in bulk), to skip asking again
+        """
         job = self._job
-        actual = self._query_remote_state()
+        actual = self._query_remote_state(run_state=run_state)
         expected = self._query_local_state()
 
         is_ok = actual == expected
         if not is_ok and save:
             logger.warning(f"Job status conflict for {job.run_id}. Will update from {expected} to {actual}")
             job.status = actual
-            job.save()
+            job.save(update_fields=['status'])
 
         return (actual, is_ok)
 
@@ -136,23 +158,24 @@ class AbstractRunner(abc.ABC):
         # First save: we tried to cancel
         logger.info(f'Manually killing job {job.run_id}')
         job.status = JobStatus.cancel_pending
-        job.save()
+        job.save(update_fields=['status'])
 
         signal_accepted = self._cancel_to_engine()
         if not signal_accepted:
             logger.error(f'Failed to cancel job {job.run_id}')
             job.status = JobStatus.unknown
-            job.save()
+            job.save(update_fields=['status'])
             return job
 
         # Second save: Update meta job fields once cancel signal confirmed
         job.expire_on = timezone.now()  # Tell background worker to clean up working directories
         job.completed_on = timezone.now()
 
-        delta = job.completed_on - job.started_on
-        job.duration = delta.seconds * 1000  # nf specifies in ms, and so do we
+        if job.started_on:  # A job canceled while still queued never started
+            delta = job.completed_on - job.started_on
+            job.duration = delta.seconds * 1000  # nf specifies in ms, and so do we
 
-        job.save()
+        job.save(update_fields=['expire_on', 'completed_on', 'duration'])
         return job
 
     #######
@@ -167,7 +190,8 @@ class AbstractRunner(abc.ABC):
         path = self._params_fn(job.run_id)
         self._stable_storage.write_contents(
             path,
-            json.dumps(params, indent=2)
+            orjson.dumps(params, option=orjson.OPT_INDENT_2),
+            mode='wb'
         )
 
     @abc.abstractmethod
@@ -188,7 +212,7 @@ class AbstractRunner(abc.ABC):
         """Rely on the DB for job execution status. This is almost always how external tools will check status"""
         return enums.JobStatus(self._job.status)
 
-    def _query_remote_state(self) -> ty.Union[JobStatus, int]:
+    def _query_remote_state(self, run_state: JobStatus = None) -> ty.Union[JobStatus, int]:
         """
         Determine the job status from three questions:
 
@@ -199,11 +223,11 @@ class AbstractRunner(abc.ABC):
         job = self._job
 
         dbv = job.status
-        if JobStatus.is_resolved(dbv):
+        if dbv in enums.RESOLVED_JOB_STATUSES:
             # If the job has been marked as resolved in any form, assume no further info needed from exec engine
             return dbv
 
-        actual_status = self._check_run_state()
+        actual_status = self._check_run_state() if run_state is None else run_state
 
         if dbv == JobStatus.cancel_pending:
             # An explicit cancel request takes precedence over other status.
@@ -222,24 +246,32 @@ class AbstractRunner(abc.ABC):
         #   useful for executors like "subprocess" where we may not have exit code info after process is ended.
 
         # Job is not running, and this is not explained by recorded callback events. Reconcile status using trace log!
+        parsed = self._load_parsed_trace()
+        if parsed is None:
+            return JobStatus.unknown
+
+        resolved = parsed.final_status()
+
+        return JobStatus.task_to_job(resolved)
+
+    def _load_parsed_trace(self) -> ty.Optional[TraceList]:
+        """Read and parse the trace file for this job. Returns None (and logs why) if the trace can't be used."""
+        job = self._job
         trace_fn = self._trace_fn(job.run_id)
         try:
-            trace_contents = self._stable_storage.read_contents(trace_fn)
-        except:
+            trace_file = self._stable_storage.open_contents(trace_fn, buffering=TRACE_READ_BUFFER)
+        except OSError:
             # No records of process running, and no records of output. Reconciliation is not possible.
             # Flag permanent loss of records for auditing/ retry
             logger.error(f'Could not locate trace file expected to reconcile job {job.run_id}')
-            return JobStatus.unknown
+            return None
 
-        try:
-            parsed = parse_tracelog(trace_contents)
-        except:
-            logger.error(f'Could not parse trace file for job {job.run_id}')
-            return JobStatus.unknown
-
-        resolved = parsed.final_status()
-
-        return JobStatus.task_to_job(resolved)
+        with trace_file:
+            try:
+                return parse_tracelog(trace_file)  # Stream rows: trace files grow with every task attempt
+            except (OSError, csv.Error, KeyError, TypeError, ValueError):  # Unreadable, or malformed rows
+                logger.error(f'Could not parse trace file for job {job.run_id}')
+                return None
 
     @abc.abstractmethod
     def _check_run_state(self) -> JobStatus:
@@ -253,20 +285,31 @@ class AbstractRunner(abc.ABC):
 
     ##############
     # Helpers: names of key NF-specific files that are used in multiple places by the compute engine.
+    def _relative(self, *parts: str) -> str:
+        """
+        A path in job storage. Each storage lookup validates the path against the storage root, and the same names
+            are needed several times per job (submit, reconcile...). A runner serves one job, so cache them here.
+        """
+        try:
+            return self._paths[parts]
+        except KeyError:
+            path = self._paths[parts] = self._stable_storage.relative(*parts)
+            return path
+
     def _params_fn(self, run_id: str) -> str:
         """Path to params file"""
-        return self._stable_storage.relative(f'inputs', 'nextflow_params.json')
+        return self._relative('inputs', 'nextflow_params.json')
 
     def _work_dir(self, run_id: str) -> str:
-        return self._stable_storage.relative(f'workdir/')
+        return self._relative('workdir/')
 
     def _trace_fn(self, run_id: str) -> str:
         """Path to nextflow execution trace file"""
-        return self._stable_storage.relative('logs', f'trace_{run_id}.txt')
+        return self._relative('logs', f'trace_{run_id}.txt')
 
     def _report_fn(self, run_id: str) -> str:
-        return self._stable_storage.relative('logs', f'report_{run_id}.html')
+        return self._relative('logs', f'report_{run_id}.html')
 
     def _log_fn(self, run_id: str) -> str:
         """Where log file will be written (or copied after run is complete, depending on executor)"""
-        return self._stable_storage.relative('logs', f'nextflow_{run_id}.log')
+        return self._relative('logs', f'nextflow_{run_id}.log')
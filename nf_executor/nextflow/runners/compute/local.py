@@ -12,6 +12,22 @@ from nf_executor.api.enums import JobStatus
 
 logger = logging.getLogger(__name__)
 
+# Handles for jobs launched by this worker process, by job ID. Popen can report the real exit code of its own children,
+#   which a bare PID check cannot. (other workers, or a restarted one, fall back to the PID check + trace file)
+#   Keyed by job rather than PID, because the OS may hand a finished child's PID to some other job's process.
+_CHILDREN: dict[int, subprocess.Popen] = {}
+
+
+def _reap_children():
+    """
+    Drop handles for children that have exited. Polling reaps them, so they don't linger as zombies. Most jobs report
+        their end via callback and are never status-checked, so this runs on every launch rather than relying on
+        `_check_run_state` to clean up. (a job reaped here falls back to the PID check + trace file, like any other)
+    """
+    for job_id, proc in list(_CHILDREN.items()):
+        if proc.poll() is not None:
+            del _CHILDREN[job_id]
+
 
 def is_running(pid: int) -> bool:
     """Check if a process is still running (UNIX only). h/t https://stackoverflow.com/a/6940314"""
@@ -77,6 +93,17 @@ class SubprocessRunner(AbstractRunner):
         job = self._job
         pid = int(job.executor_id)
 
+        proc = _CHILDREN.get(job.pk)
+        if proc is not None and proc.pid == pid:
+            # Also reaps the child once done, so finished jobs don't linger as zombies that look like they're running
+            exit_code = proc.poll()
+            if exit_code is None:
+                return JobStatus.started
+
+            # The process is gone; don't hold its handle for the life of the worker
+            del _CHILDREN[job.pk]
+            return JobStatus.completed if exit_code == 0 else JobStatus.error
+
         ok = is_running(pid)
         if ok:
             return JobStatus.started
@@ -96,28 +123,58 @@ class SubprocessRunner(AbstractRunner):
         sync = kwargs.get('sync', False)
         if sync:
             # Really really really only use this for debugging: web request shouldn't ever block on a child process
-            proc = subprocess.run(args, capture_output=True)
-            logger.debug('Finished job run. Stdout: %s',  proc.stdout)
-            logger.debug('Finished job run. Stderr: %s', proc.stderr)
+            # Console output of a long run can be large, so stream it to a file rather than holding it in memory
+            if logger.isEnabledFor(logging.DEBUG):
+                out_fn = self._submit_log_fn(job.run_id)
+                os.makedirs(os.path.dirname(out_fn), exist_ok=True)
+                with open(out_fn, 'wb') as f:
+                    proc = subprocess.Popen(args, stdout=f, stderr=subprocess.STDOUT)
+                    proc.wait()
+                logger.debug('Finished job run. Console output written to: %s', out_fn)
+            else:
+                proc = subprocess.Popen(args, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+                proc.wait()
         else:
-            proc = subprocess.Popen(args)
+            # Detach from the web worker: own session (so it outlives the worker, and can be signaled as a group), no
+            #   shared console streams. Nextflow writes its own log file. Worker fds (DB sockets etc) are not inherited.
+            proc = subprocess.Popen(
+                args,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                start_new_session=True,
+                close_fds=True,
+            )
+            _reap_children()
+            _CHILDREN[job.pk] = proc
 
         pid = str(proc.pid)
 
         logger.info(f"Executor accepted job '{job.run_id}' and assigned identifier '{pid}'")
         return pid
 
+    def _submit_log_fn(self, run_id: str) -> str:
+        """Console output of a synchronous (debug) run"""
+        return self._relative('logs', f'submit_{run_id}.log')
+
     def _cancel_to_engine(self) -> bool:
         """
         Kill the job
         """
         job = self._job
+        pid = int(job.executor_id)
         try:
             # WARNING: This DOES NOT VERIFY that PID is the thing originally scheduled. It could be reused.
             #    The subprocess executor is NOT PRODUCTION GRADE and so this is a simplistic implementation.
 
             # In the event of a gentle sigterm, NF will send a completed event + error report to http
-            os.kill(int(job.executor_id), signal.SIGTERM)
+            # Jobs are launched in their own session (PGID == PID), so signal the group: this reaches task processes
+            #   that nextflow started, not just nextflow itself.
+            try:
+                os.killpg(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                # No such group: jobs launched before they got their own session. Signal the process alone.
+                os.kill(pid, signal.SIGTERM)
         except OSError as e:
             if e.errno == errno.ESRCH:
                 logger.info(f'Failed to kill {job.pk} because it is not running')
@@ -126,3 +183,4 @@ class SubprocessRunner(AbstractRunner):
         except:
             logger.exception(f'Canceling job {job.pk} failed for unknown reason')
             return False
+        return True
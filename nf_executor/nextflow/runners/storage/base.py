@@ -1,7 +1,6 @@
 import abc
 import logging
 import os
-from pathlib import Path
 
 from django.utils.text import slugify
 
@@ -23,7 +22,8 @@ class AbstractJobStorage(abc.ABC):
         if root:
             self._path = self.relative(root, logs_dir, check=False)
 
-        self._p = Path(self._path).resolve()  # Used for checking paths. Convert symlinks to absolute form
+        # Used for checking paths: a string prefix test, so validation never has to touch the filesystem
+        self._root_prefix = os.path.join(os.path.normpath(self._path), '')
 
     def get_home(self) -> str:
         """Get the home directory for this storage location (root + project specific name)"""
@@ -41,8 +41,7 @@ class AbstractJobStorage(abc.ABC):
         res = os.path.join(self._path, *args)
 
         if check and len(args) > 1:
-            p = Path(res).resolve()
-            if res == self._path or self._p not in p.parents:
+            if not os.path.normpath(res).startswith(self._root_prefix):
                 raise StorageAccessException('Relative path must be a child of root')
         return res
 
@@ -70,6 +69,15 @@ class AbstractJobStorage(abc.ABC):
         """Return the full content of a small file (eg log file). Not intended for large binary files."""
         raise NotImplementedError
 
+    @abc.abstractmethod
+    def open_contents(self, path: str, mode: str = 'r', buffering: int = -1):
+        """
+        Open a file for streaming reads, eg to parse a large trace file line by line. Use as a context manager.
+
+        `buffering` is the read buffer size in bytes, as for `open()`. (-1 = provider default)
+        """
+        raise NotImplementedError
+
     def write_contents(self, path: str, content, mode='w'):
         """Write a small file, such as a config file, to the specified path"""
         raise NotImplementedError
@@ -13,25 +13,36 @@ class LocalStorage(AbstractJobStorage):
         super().__init__(*args, **kwargs)
 
         # Make sure the directory exists before we try to use it. (unlike S3, prefix matters!)
-        if not os.path.isdir(self._path):
-            os.makedirs(self._path)
+        # One call, no separate existence check: safe if two jobs create the same parent folder at once
+        os.makedirs(self._path, exist_ok=True)
 
     def setup(self):
-        wd = self._path
-        if not os.path.isdir(wd):
-            logger.info(f'Creating working directory: {wd}')
-            os.makedirs(wd)
+        os.makedirs(self._path, exist_ok=True)
 
     def read_contents(self, path: str, mode: str = 'r'):
         full = self.relative(path)
         with open(full, mode) as f:
             return f.read()
 
+    def open_contents(self, path: str, mode: str = 'r', buffering: int = -1):
+        full = self.relative(path)
+        return open(full, mode, buffering=buffering, newline='' if 'b' not in mode else None)
+
     def write_contents(self, path: str, content, mode='w'):
         base = os.path.dirname(path)
-        os.makedirs(base, exist_ok=True)  # make containing folder first if needed.
-        with open(path, mode) as f:
-            f.write(content)
+        if base and base != self._path:
+            os.makedirs(base, exist_ok=True)  # make containing folder first if needed. (root exists since __init__)
+
+        # Write to a temp file, then swap it in: readers (eg nextflow -params-file) never see a half-written file
+        tmp = f'{path}.tmp.{os.getpid()}'
+        try:
+            with open(tmp, mode) as f:
+                f.write(content)
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
 
     def _delete(self, path):
         if not os.path.exists(path):
@@ -1,9 +1,12 @@
 from datetime import datetime
+import functools
 import json
 import os.path
+from unittest import mock
 
 from django.test import TestCase
 
+from nf_executor.api import models
 from nf_executor.api.enums import JobStatus, TaskStatus
 
 from nf_executor.api.tests.factories import (
@@ -16,46 +19,37 @@ from nf_executor.nextflow.parsers import from_http
 FIXTURE_DIR = os.path.join(os.path.dirname(__file__), '../fixtures')
 
 
-def get_job_started_event() -> dict:
-    fn = os.path.join(FIXTURE_DIR, 'json_events/job_started.json')
+@functools.lru_cache(maxsize=None)
+def _load_fixture(name: str):
+    """Each fixture is read once per test run. Shared by all tests, so treat the result as read-only."""
+    fn = os.path.join(FIXTURE_DIR, 'json_events', name)
     with open(fn, 'r') as f:
         content = json.load(f)
     return content
 
 
+def get_job_started_event() -> dict:
+    return _load_fixture('job_started.json')
+
+
 def get_job_completed_event() -> dict:
-    fn = os.path.join(FIXTURE_DIR, 'json_events/job_completed.json')
-    with open(fn, 'r') as f:
-        content = json.load(f)
-    return content
+    return _load_fixture('job_completed.json')
 
 
 def get_task_submitted_event() -> dict:
-    fn = os.path.join(FIXTURE_DIR, 'json_events/process_submitted.json')
-    with open(fn, 'r') as f:
-        content = json.load(f)
-    return content
+    return _load_fixture('process_submitted.json')
 
 
 def get_task_started_event() -> dict:
-    fn = os.path.join(FIXTURE_DIR, 'json_events/process_started.json')
-    with open(fn, 'r') as f:
-        content = json.load(f)
-    return content
+    return _load_fixture('process_started.json')
 
 
 def get_task_completed_event() -> dict:
-    fn = os.path.join(FIXTURE_DIR, 'json_events/process_completed.json')
-    with open(fn, 'r') as f:
-        content = json.load(f)
-    return content
+    return _load_fixture('process_completed.json')
 
 
 def get_full_event_stream() -> list[dict]:
-    fn = os.path.join(FIXTURE_DIR, 'json_events/nextflow-mock-full-http.json')
-    with open(fn, 'r') as f:
-        content = json.load(f)
-    return content
+    return _load_fixture('nextflow-mock-full-http.json')
 
 
 class JobStatusParserTests(TestCase):
@@ -70,7 +64,7 @@ class JobStatusParserTests(TestCase):
         filled_job = from_http.parse_event(new_job, payload)
 
         filled_job.save()
-        filled_job.refresh_from_db()
+        filled_job.refresh_from_db(fields=['started_on', 'status'])
 
         self.assertEqual(
             filled_job.started_on,
@@ -95,7 +89,7 @@ class JobStatusParserTests(TestCase):
         filled_job = from_http.parse_event(job, payload)
 
         filled_job.save()
-        filled_job.refresh_from_db()
+        filled_job.refresh_from_db(fields=['completed_on', 'status', 'duration', 'succeed_count'])
 
         self.assertEqual(
             filled_job.completed_on,
@@ -135,8 +129,6 @@ class TaskStatusParserTests(TestCase):
         revised_task = from_http.parse_event(self.running_job, payload)
 
         revised_task.save()
-        self.running_job.refresh_from_db()  # update relationship set
-
         self.assertEqual(
             self.running_job.task_set.count(),
             1,
@@ -156,8 +148,6 @@ class TaskStatusParserTests(TestCase):
         revised_task = from_http.parse_event(self.running_job, payload)
 
         revised_task.save()
-        self.running_job.refresh_from_db()  # update relationship set
-
         self.assertEqual(
             self.running_job.task_set.count(),
             1,
@@ -186,8 +176,6 @@ class TaskStatusParserTests(TestCase):
         new_task = from_http.parse_event(self.running_job, payload)
 
         new_task.save()
-        self.running_job.refresh_from_db()  # update relationship set
-
         self.assertEqual(
             self.running_job.task_set.count(),
             1,
@@ -201,8 +189,6 @@ class TaskStatusParserTests(TestCase):
         revised_task = from_http.parse_event(self.running_job, payload)
 
         revised_task.save()
-        self.running_job.refresh_from_db()  # update relationship set
-
         self.assertEqual(
             self.running_job.task_set.count(),
             1,
@@ -231,8 +217,6 @@ class TaskStatusParserTests(TestCase):
         new_task = from_http.parse_event(self.running_job, payload)
 
         new_task.save()
-        self.running_job.refresh_from_db()  # update relationship set
-
         self.assertEqual(
             self.running_job.task_set.count(),
             1,
@@ -251,7 +235,7 @@ class FullSequenceParserTests(TestCase):
             item = from_http.parse_event(job, record)
             item.save()
 
-        job.refresh_from_db()
+        job.refresh_from_db(fields=['status'])
 
         self.assertEqual(job.task_set.count(), 3, 'Three task records created')
         self.assertEqual(
@@ -269,3 +253,60 @@ class FullSequenceParserTests(TestCase):
         """Pathological case: even if events are handled out of order, final DB state should be the same"""
         payload = reversed(get_full_event_stream())
         self._same_result_helper(payload)
+
+
+class BulkSequenceParserTests(TestCase):
+    """A batch of events gives the same result as handling events one at a time"""
+    def _same_result_helper(self, events):
+        job = JobFactory(is_submitted=True)
+
+        tasks = from_http.parse_events_bulk(job, events)
+        job.refresh_from_db(fields=['status'])
+
+        self.assertEqual(len(tasks), 3, 'One record returned per task')
+        self.assertEqual(job.task_set.count(), 3, 'Three task records created')
+        self.assertEqual(
+            job.task_set.filter(status=TaskStatus.COMPLETED.value).count(),
+            3,
+            'All task records completed'
+        )
+        self.assertEqual(job.status, JobStatus.completed.value, 'Job resolves to completed')
+
+    def test_full_event_stream_creates_expected_tasks(self):
+        self._same_result_helper(get_full_event_stream())
+
+    def test_reversed_full_event_stream_creates_expected_tasks(self):
+        self._same_result_helper(reversed(get_full_event_stream()))
+
+    def test_batch_updates_existing_tasks(self):
+        job = JobFactory(is_started=True)
+        TaskFactory(job=job, task_id=1, is_completed=True)
+
+        with self.assertNumQueries(2):
+            # One query to find existing tasks, one to write them
+            from_http.parse_events_bulk(job, [get_task_submitted_event(), get_task_started_event()])
+
+        self.assertEqual(job.task_set.count(), 1, 'Existing task was updated in place')
+        self.assertEqual(
+            job.task_set.get().status,
+            TaskStatus.COMPLETED.value,
+            'Higher status is not overridden'
+        )
+
+    def test_concurrently_created_task_keeps_higher_status(self):
+        """A late submission event must not downgrade a task that another writer created (and completed) meanwhile"""
+        job = JobFactory(is_started=True)
+        bulk_create = models.Task.objects.bulk_create
+
+        def create_after_race(*args, **kwargs):
+            TaskFactory(job=job, task_id=1, is_completed=True)  # Lands between our lookup and our insert
+            return bulk_create(*args, **kwargs)
+
+        with mock.patch.object(models.Task.objects, 'bulk_create', side_effect=create_after_race):
+            tasks = from_http.parse_events_bulk(job, [get_task_submitted_event()])
+
+        task = job.task_set.get()
+        self.assertEqual(task.status, TaskStatus.COMPLETED.value, 'Higher status is not overridden')
+        self.assertIsNotNone(task.completed_on, 'Fields set by the other writer are kept')
+        self.assertEqual(task.name, get_task_submitted_event()['trace']['name'], 'This batch is applied on top')
+        self.assertEqual([t.pk for t in tasks], [task.pk], 'Returned record is the stored row')
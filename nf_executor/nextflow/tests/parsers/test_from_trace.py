@@ -1,4 +1,5 @@
 """Test the ability to parse trace file contents"""
+from datetime import datetime
 import os
 from unittest import TestCase
 
@@ -10,9 +11,8 @@ FIXTURE_DIR = os.path.join(os.path.dirname(__file__), '../fixtures')
 
 
 def _get_contents(fn: str) -> TraceList[NFTraceEvent]:
-    with open(fn, 'r') as f:
-        content = f.read()
-    return from_trace.parse_tracelog(content)
+    with open(fn, 'r', newline='') as f:
+        return from_trace.parse_tracelog(f)
 
 
 def get_trace_contents() -> TraceList[NFTraceEvent]:
@@ -34,6 +34,36 @@ class TestFromTrace(TestCase):
         )
         self.assertEqual(len(items), 7, 'Parses one record per line')
 
+    def test_events_have_no_instance_dict(self):
+        self.assertFalse(hasattr(self._items[0], '__dict__'), 'Trace events use slots to keep large traces small')
+
+    def test_parser_keeps_literal_quotes_and_skips_blank_lines(self):
+        fn = os.path.join(FIXTURE_DIR, 'trace_files/job-success-no-retries.txt')
+        with open(fn, 'r') as f:
+            header, first, *_ = f.read().splitlines()
+        content = '\n'.join([header, first.replace('SPLITLETTERS', '"SPLIT\'LETTERS'), '', ''])
+
+        items = from_trace.parse_tracelog(content)
+        self.assertEqual(len(items), 1, 'Blank trailing lines are not parsed as records')
+        self.assertEqual(items[0].name, '"SPLIT\'LETTERS (1)', 'Quote characters are kept as part of the value')
+
+    def test_parser_accepts_full_text(self):
+        fn = os.path.join(FIXTURE_DIR, 'trace_files/nextflow-mock-full-trace.txt')
+        with open(fn, 'r') as f:
+            items = from_trace.parse_tracelog(f.read())
+        self.assertListEqual(
+            [(item.task_id, item.status) for item in items],
+            [(item.task_id, item.status) for item in self._items],
+            'Parsing file text gives the same records as streaming the file'
+        )
+
+    def test_typed_columns_convert_on_first_access(self):
+        item = self._items[0]
+        self.assertIsInstance(item._submit, str, 'Raw text is kept until the column is read')
+        self.assertIsInstance(item.submit, datetime)
+        self.assertIs(item.submit, item.submit, 'Conversion happens once')
+        self.assertEqual(item.exit_code, 0)
+
     def test_helper_consolidates_items(self):
         items = self._items
         items = items.consolidate()
@@ -50,6 +80,23 @@ class TestFromTrace(TestCase):
             'Consolidation chooses the highest status for all tasks'
         )
 
+    def test_consolidate_is_cached_until_list_changes(self):
+        items = self._items
+        first = items.consolidate()
+        self.assertIs(items.consolidate(), first, 'Repeat calls reuse the consolidated view')
+
+        del items[-2]
+        self.assertIsNot(items.consolidate(), first, 'Changing the list discards the consolidated view')
+        self.assertEqual(items.consolidate()[-1].status, TaskStatus.ABORTED, 'Rebuilt view reflects the change')
+
+    def test_summary_gathers_all_aggregates(self):
+        summary = self._items.summarize()
+        self.assertFalse(summary.has_aborted)
+        self.assertTrue(summary.has_failed)
+        self.assertFalse(summary.all_completed)
+        self.assertIsNone(summary.max_running, 'No tasks are still running')
+        self.assertEqual(summary.max_error, TaskStatus.FAILED)
+
     def test_helper_checks_abort(self):
         items = self._items
         del items[-2]  # Remove the "failed" record for last task, so that the list consolidates to "aborted"
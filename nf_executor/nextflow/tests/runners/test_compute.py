@@ -4,13 +4,25 @@ Test compute backend features
 We don't really want to be executing real jobs. Instead, this package is focused on things like state reconciliation
  (based on fixture files and mock status codes)
 """
+import json
 import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from unittest import mock
 
-from django.test import TestCase
+import botocore.exceptions
+from django.test import SimpleTestCase, TestCase
 
+from nf_executor.api import models
 from nf_executor.api.enums import JobStatus
 from nf_executor.api.tests.factories import JobFactory
-from nf_executor.nextflow.runners import AbstractRunner, get_runner
+from nf_executor.nextflow.exceptions import JobStateException, StaleJobException
+from nf_executor.nextflow.runners import AbstractRunner, get_runner, reconcile_jobs
+from nf_executor.nextflow.runners.compute.aws_batch import AWSBatchRunner
+from nf_executor.nextflow.runners.compute import local
 from nf_executor.nextflow.runners.storage import LocalStorage
 
 # A library of fixture files for various situations
@@ -52,17 +64,19 @@ class PseudoRunner(AbstractRunner):
         return 'the check is in the mail'
 
 
+TRACE_FIXTURES = {
+    'SUCCESS': 'job-success-with-task-retries.txt',
+    'FAILURE': 'job-fail-task2-retries-and-aborts.txt',
+    'UNKNOWN': 'nonexistent/nothere.txt'
+}
+
+
 def make_runner(job, exit_code, trace_choice):
-    traces = {
-        'SUCCESS': 'job-success-with-task-retries.txt',
-        'FAILURE': 'job-fail-task2-retries-and-aborts.txt',
-        'UNKNOWN': 'nonexistent/nothere.txt'
-    }
     return PseudoRunner(
         job,
-        LocalStorage(os.path.join(FIXTURE_DIR)),
+        LocalStorage(FIXTURE_DIR),
         exit_code=exit_code,
-        trace_fn=traces[trace_choice]
+        trace_fn=TRACE_FIXTURES[trace_choice]
     )
 
 
@@ -76,9 +90,10 @@ class TestRunnerReconciliation(TestCase):
         scenarios = [JobFactory(is_completed=True), JobFactory(is_canceled=True)]
 
         for j in scenarios:
-            runner = make_runner(j, 42, 'UNKNOWN')
-            actual, is_ok = runner.reconcile_job_status(save=False)
-            self.assertTrue(is_ok, f'Reconciliation favors the actual job status for job {j.status}')
+            with self.subTest(status=j.status):
+                runner = make_runner(j, 42, 'UNKNOWN')
+                actual, is_ok = runner.reconcile_job_status(save=False)
+                self.assertTrue(is_ok, f'Reconciliation favors the actual job status for job {j.status}')
 
     ###
     # Cancel functionality, including reconciliation of pending cancel status. Note: trace file never used to make
@@ -121,57 +136,278 @@ class TestRunnerReconciliation(TestCase):
         scenarios = [JobFactory(is_submitted=True), JobFactory(is_started=True)]
 
         for job in scenarios:
-            runner = make_runner(job, 0, 'UNKNOWN')
+            with self.subTest(status=job.status):
+                runner = make_runner(job, 0, 'UNKNOWN')
 
-            actual, is_ok = runner.reconcile_job_status(save=False)
-            self.assertFalse(is_ok, f'Lost job with initial status {job.status} requires reconciliation')
-            self.assertEqual(actual, JobStatus.completed,
-                             f'Lost job with initial status {job.status} is resolved based on exit code')
+                actual, is_ok = runner.reconcile_job_status(save=False)
+                self.assertFalse(is_ok, f'Lost job with initial status {job.status} requires reconciliation')
+                self.assertEqual(actual, JobStatus.completed,
+                                 f'Lost job with initial status {job.status} is resolved based on exit code')
 
     def test_submitted_job_actually_completed_by_trace(self):
         """We lost track of a job at submission time, and resolve as "success" later based on trace"""
         scenarios = [JobFactory(is_submitted=True), JobFactory(is_started=True)]
 
         for job in scenarios:
-            runner = make_runner(job, None, 'SUCCESS')
+            with self.subTest(status=job.status):
+                runner = make_runner(job, None, 'SUCCESS')
 
-            actual, is_ok = runner.reconcile_job_status(save=False)
-            self.assertFalse(is_ok, f'Lost job with initial status {job.status} requires reconciliation')
-            self.assertEqual(actual, JobStatus.completed,
-                             f'Lost job with initial status {job.status} is resolved based on trace')
+                actual, is_ok = runner.reconcile_job_status(save=False)
+                self.assertFalse(is_ok, f'Lost job with initial status {job.status} requires reconciliation')
+                self.assertEqual(actual, JobStatus.completed,
+                                 f'Lost job with initial status {job.status} is resolved based on trace')
 
     def test_submitted_job_actually_failed_by_exit_code(self):
         """We lost track of a job at submission time, and resolve as "failed" later based on exit status"""
         scenarios = [JobFactory(is_submitted=True), JobFactory(is_started=True)]
 
         for job in scenarios:
-            runner = make_runner(job, 1, 'UNKNOWN')
+            with self.subTest(status=job.status):
+                runner = make_runner(job, 1, 'UNKNOWN')
 
-            actual, is_ok = runner.reconcile_job_status(save=False)
-            self.assertFalse(is_ok, f'Lost job with initial status {job.status} requires reconciliation')
-            self.assertEqual(actual, JobStatus.error,
-                             f'Lost job with initial status {job.status} is resolved based on exit code')
+                actual, is_ok = runner.reconcile_job_status(save=False)
+                self.assertFalse(is_ok, f'Lost job with initial status {job.status} requires reconciliation')
+                self.assertEqual(actual, JobStatus.error,
+                                 f'Lost job with initial status {job.status} is resolved based on exit code')
 
     def test_submitted_job_actually_failed_by_trace(self):
         """We lost track of a job at submission time, and resolve as "failure" later based on trace file"""
         scenarios = [JobFactory(is_submitted=True), JobFactory(is_started=True)]
 
         for job in scenarios:
-            runner = make_runner(job, None, 'FAILURE')
+            with self.subTest(status=job.status):
+                runner = make_runner(job, None, 'FAILURE')
 
-            actual, is_ok = runner.reconcile_job_status(save=False)
-            self.assertFalse(is_ok, f'Lost job with initial status {job.status} requires reconciliation')
-            self.assertEqual(actual, JobStatus.error,
-                             f'Lost job with initial status {job.status} is resolved based on trace')
+                actual, is_ok = runner.reconcile_job_status(save=False)
+                self.assertFalse(is_ok, f'Lost job with initial status {job.status} requires reconciliation')
+                self.assertEqual(actual, JobStatus.error,
+                                 f'Lost job with initial status {job.status} is resolved based on trace')
 
     def test_submitted_job_cannot_be_resolved(self):
         """We lost track of a job at submission time, and resolve as "unknown" later when all records are lost"""
         scenarios = [JobFactory(is_submitted=True), JobFactory(is_started=True)]
 
         for job in scenarios:
-            runner = make_runner(job, None, 'UNKNOWN')
+            with self.subTest(status=job.status):
+                runner = make_runner(job, None, 'UNKNOWN')
+
+                actual, is_ok = runner.reconcile_job_status(save=False)
+                self.assertFalse(is_ok, f'Lost job with initial status {job.status} requires reconciliation')
+                self.assertEqual(actual, JobStatus.unknown,
+                                 f'Lost job with initial status {job.status} cannot be resolved')
+
+    def test_unparseable_trace_cannot_be_resolved(self):
+        """A trace file that exists but can't be parsed is treated like a missing one"""
+        job = JobFactory(is_started=True)
+        with tempfile.TemporaryDirectory() as tmp:
+            storage = LocalStorage(tmp)
+            storage.write_contents(os.path.join(tmp, 'trace.txt'), 'task_id\thash\tstatus\n1\tab/cdef\tNOT_A_STATUS\n')
+            runner = PseudoRunner(job, storage, exit_code=None, trace_fn='trace.txt')
 
             actual, is_ok = runner.reconcile_job_status(save=False)
-            self.assertFalse(is_ok, f'Lost job with initial status {job.status} requires reconciliation')
-            self.assertEqual(actual, JobStatus.unknown,
-                             f'Lost job with initial status {job.status} cannot be resolved')
+
+        self.assertFalse(is_ok)
+        self.assertEqual(actual, JobStatus.unknown, 'Unparseable trace cannot be used to resolve the job')
+
+    def test_saved_resolution_also_stores_expiry(self):
+        """Partial saves still persist fields that the model derives from a status change"""
+        job = JobFactory(is_started=True)
+        runner = make_runner(job, 0, 'UNKNOWN')
+
+        runner.reconcile_job_status(save=True)
+        job.refresh_from_db()
+        self.assertEqual(job.status, JobStatus.completed)
+        self.assertIsNotNone(job.expire_on, 'Resolved jobs are scheduled for cleanup')
+
+
+class TestRun(TestCase):
+    def test_job_already_handed_to_engine_is_not_resubmitted(self):
+        job = JobFactory(is_submitted=True)
+        runner = make_runner(job, None, 'UNKNOWN')
+
+        models.Job.objects.filter(pk=job.pk).update(executor_id='12345')  # Another request got there first
+        with self.assertRaises(StaleJobException):
+            runner.run({}, 'http://callback.example')
+
+
+class TestGetRunner(TestCase):
+    def test_runner_is_memoized_on_job(self):
+        job = JobFactory(is_submitted=True, job_storage_root='memoized')
+        self.assertIs(get_runner(job), get_runner(job), 'Repeat lookups for the same job reuse one runner')
+
+    def test_runner_with_options_is_not_memoized(self):
+        job = JobFactory(is_submitted=True, job_storage_root='memoized')
+        default = get_runner(job)
+        self.assertIsNot(get_runner(job, root=tempfile.gettempdir()), default, 'Custom options build a separate runner')
+
+
+class TestReconcileJobs(TestCase):
+    def test_changed_statuses_are_saved_in_bulk(self):
+        lost = JobFactory.create_batch(2, is_started=True, executor_id='-1', job_storage_root='memoized')
+        done = JobFactory(is_completed=True, job_storage_root='memoized')
+
+        changed = reconcile_jobs([*lost, done])
+
+        self.assertListEqual([j.pk for j in changed], [j.pk for j in lost], 'Only jobs in conflict are updated')
+        for job in lost:
+            job.refresh_from_db()
+            self.assertEqual(job.status, JobStatus.unknown, 'Lost jobs are flagged when no records are found')
+
+    @mock.patch('nf_executor.nextflow.runners._CC', AWSBatchRunner)
+    def test_batch_jobs_are_looked_up_together(self):
+        jobs = [
+            JobFactory(is_started=True, executor_id=f'arn:job/{i}', job_storage_root='memoized') for i in range(3)
+        ]
+        client = mock.Mock()
+        client.describe_jobs.side_effect = lambda jobs: {
+            'jobs': [{'jobArn': arn, 'status': 'SUCCEEDED'} for arn in jobs]
+        }
+
+        with mock.patch('boto3.client', return_value=client):
+            changed = reconcile_jobs(jobs)
+
+        self.assertEqual(client.describe_jobs.call_count, 1, 'One lookup for the whole batch')
+        self.assertEqual(len(changed), 3)
+        self.assertTrue(all(job.status == JobStatus.completed for job in changed))
+
+    @mock.patch('nf_executor.nextflow.runners._CC', AWSBatchRunner)
+    def test_batch_jobs_are_skipped_if_lookup_fails(self):
+        job = JobFactory(is_started=True, executor_id='arn:job/1', job_storage_root='memoized')
+        client = mock.Mock()
+        client.describe_jobs.side_effect = botocore.exceptions.ClientError({'Error': {}}, 'DescribeJobs')
+
+        with mock.patch('boto3.client', return_value=client), self.assertLogs(level='ERROR'):
+            changed = reconcile_jobs([job])
+
+        self.assertListEqual(changed, [], 'A failed lookup is not a reason to change job status')
+
+
+class TestRunnerConfig(TestCase):
+    def test_default_config_uses_subclass_key(self):
+        job = JobFactory(job_storage_root='memoized')
+        runner = AWSBatchRunner(job, LocalStorage(tempfile.gettempdir()))
+        self.assertIn('HEAD_QUEUE_ARN', runner._config, 'Runner reads the settings block for its own engine')
+
+
+class TestWriteParams(TestCase):
+    def test_params_file_is_valid_json(self):
+        job = JobFactory(is_submitted=True)
+        params = {'greeting': 'Hello', 'samples': [1, 2, 3]}
+
+        with tempfile.TemporaryDirectory() as root:
+            runner = PseudoRunner(job, LocalStorage(root))
+            runner._write_params(job, params)
+            with open(runner._params_fn(job.run_id), 'r') as f:
+                self.assertEqual(json.load(f), params, 'Params file round trips')
+
+
+class TestAWSBatchBulkState(SimpleTestCase):
+    def test_describes_jobs_in_chunks(self):
+        arns = [f'arn:job/{i}' for i in range(150)]
+        client = mock.Mock()
+        client.describe_jobs.side_effect = lambda jobs: {
+            'jobs': [{'jobArn': arn, 'status': 'RUNNING'} for arn in jobs if arn != 'arn:job/7']
+        }
+
+        result = AWSBatchRunner.bulk_query_remote_state(arns, client=client)
+
+        self.assertEqual(client.describe_jobs.call_count, 2, 'One API call per 100 job IDs')
+        self.assertEqual(len(result), 150, 'Reports a status for every requested job')
+        self.assertEqual(result['arn:job/149'], JobStatus.started)
+        self.assertEqual(result['arn:job/7'], JobStatus.unknown, 'Jobs missing from batch records are unknown')
+
+    def test_failed_lookup_leaves_jobs_out(self):
+        arns = [f'arn:job/{i}' for i in range(150)]
+        client = mock.Mock()
+        client.describe_jobs.side_effect = [
+            botocore.exceptions.ClientError({'Error': {'Code': 'TooManyRequestsException'}}, 'DescribeJobs'),
+            {'jobs': [{'jobArn': arn, 'status': 'RUNNING'} for arn in arns[100:]]},
+        ]
+
+        with self.assertLogs('nf_executor.nextflow.runners.compute.aws_batch', 'ERROR'):
+            result = AWSBatchRunner.bulk_query_remote_state(arns, client=client)
+
+        self.assertListEqual(list(result), arns[100:], 'Jobs whose lookup failed are not reported as unknown')
+
+    def test_unrecognized_batch_status_fails(self):
+        client = mock.Mock()
+        client.describe_jobs.return_value = {'jobs': [{'jobArn': 'arn:job/1', 'status': 'NEW_STATE'}]}
+        with self.assertRaises(JobStateException):
+            AWSBatchRunner.bulk_query_remote_state(['arn:job/1'], client=client)
+
+
+class TestSubprocessRunState(TestCase):
+    def _launch(self, script):
+        proc = subprocess.Popen([sys.executable, '-c', script])
+        job = JobFactory(is_started=True, executor_id=str(proc.pid), job_storage_root='memoized')
+        self.addCleanup(local._CHILDREN.pop, job.pk, None)
+        local._CHILDREN[job.pk] = proc
+        proc.wait()
+        return job
+
+    def _check(self, job):
+        return local.SubprocessRunner(job, LocalStorage(tempfile.gettempdir()))._check_run_state()
+
+    def test_exit_code_of_own_child_is_used(self):
+        self.assertEqual(self._check(self._launch('pass')), JobStatus.completed)
+        self.assertEqual(self._check(self._launch('raise SystemExit(3)')), JobStatus.error)
+
+    def test_finished_child_is_forgotten(self):
+        job = self._launch('pass')
+        self._check(job)
+        self.assertNotIn(job.pk, local._CHILDREN, 'Handle is dropped once the exit code has been read')
+
+    def test_finished_children_are_reaped_without_status_checks(self):
+        done = self._launch('pass')
+        running = subprocess.Popen([sys.executable, '-c', 'input()'], stdin=subprocess.PIPE)
+        self.addCleanup(running.wait)
+        self.addCleanup(running.stdin.close)
+        self.addCleanup(local._CHILDREN.pop, -1, None)
+        local._CHILDREN[-1] = running
+
+        local._reap_children()
+        self.assertNotIn(done.pk, local._CHILDREN, 'Exited child is reaped even if nobody checked its job')
+        self.assertIn(-1, local._CHILDREN, 'Running child is kept')
+
+    def test_reused_pid_does_not_borrow_exit_code(self):
+        """Another job that ends up with the same PID must not see this worker's old child status"""
+        finished = self._launch('raise SystemExit(3)')
+        other = JobFactory(is_started=True, executor_id=finished.executor_id, job_storage_root='memoized')
+
+        self.assertEqual(self._check(other), JobStatus.unknown, 'Falls back to PID check, not the stale handle')
+        self.assertIn(finished.pk, local._CHILDREN, 'Handle of the original job is left alone')
+
+    def test_handle_must_match_job_pid(self):
+        job = self._launch('raise SystemExit(3)')
+        job.executor_id = str(int(job.executor_id) + 1_000_000)  # Not a live PID
+
+        self.assertEqual(self._check(job), JobStatus.unknown, 'Handle for a different process is not used')
+
+    def test_cancel_signals_process_group(self):
+        proc = subprocess.Popen(
+            [sys.executable, '-c', 'import subprocess, sys; subprocess.run([sys.executable, "-c", "input()"])'],
+            stdin=subprocess.PIPE,
+            start_new_session=True,
+        )
+        self.addCleanup(proc.stdin.close)
+        job = JobFactory(is_submitted=True, executor_id=str(proc.pid), job_storage_root='memoized')
+        runner = local.SubprocessRunner(job, LocalStorage(tempfile.gettempdir()))
+
+        runner.cancel()
+        self.assertIsNotNone(job.completed_on, 'Successful cancel records the job end')
+        self.assertEqual(proc.wait(timeout=10), -signal.SIGTERM)
+        with self.assertRaises(ProcessLookupError, msg='No process in the job group survives'):
+            for _ in range(50):
+                os.killpg(proc.pid, 0)
+                time.sleep(0.1)
+
+    def test_cancel_signals_process_outside_its_own_group(self):
+        """Jobs launched before they got their own session share the worker's process group"""
+        proc = subprocess.Popen([sys.executable, '-c', 'input()'], stdin=subprocess.PIPE)
+        self.addCleanup(proc.stdin.close)
+        job = JobFactory(is_submitted=True, executor_id=str(proc.pid), job_storage_root='memoized')
+        runner = local.SubprocessRunner(job, LocalStorage(tempfile.gettempdir()))
+
+        runner.cancel()
+        self.assertIsNotNone(job.completed_on, 'Successful cancel records the job end')
+        self.assertEqual(proc.wait(timeout=10), -signal.SIGTERM)
@@ -0,0 +1,54 @@
+"""
+Test storage backend helpers
+"""
+import os
+import tempfile
+
+from django.test import SimpleTestCase
+
+from nf_executor.nextflow.exceptions import StorageAccessException
+from nf_executor.nextflow.runners.storage import LocalStorage
+
+
+class TestRelativePaths(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.storage = LocalStorage('nf_executor_storage_test', root=tmp.name)
+
+    def test_child_path_is_allowed(self):
+        path = self.storage.relative('logs', 'trace.txt')
+        self.assertEqual(path, os.path.join(self.storage.get_home(), 'logs', 'trace.txt'))
+
+    def test_path_outside_root_is_rejected(self):
+        with self.assertRaises(StorageAccessException):
+            self.storage.relative('logs', '../../elsewhere.txt')
+
+    def test_root_itself_is_rejected(self):
+        with self.assertRaises(StorageAccessException):
+            self.storage.relative('logs', '..')
+
+    def test_sibling_with_shared_prefix_is_rejected(self):
+        """A folder whose name merely starts with the root name is not inside the root"""
+        with self.assertRaises(StorageAccessException):
+            self.storage.relative('..', 'nf_executor_storage_test_other', 'x.txt')
+
+
+class TestWriteContents(SimpleTestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.storage = LocalStorage('nf_executor_storage_test', root=tmp.name)
+
+    def test_write_replaces_whole_file(self):
+        path = self.storage.relative('params', 'write_test.json')
+
+        self.storage.write_contents(path, 'first version, which is longer')
+        self.storage.write_contents(path, 'second')
+
+        self.assertEqual(self.storage.read_contents(path), 'second')
+        self.assertListEqual(
+            os.listdir(os.path.dirname(path)),
+            ['write_test.json'],
+            'No temporary files are left behind'
+        )
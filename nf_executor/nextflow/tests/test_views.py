@@ -1,13 +1,19 @@
 from datetime import timedelta
+import os
 import uuid
 
-from django.test import TestCase
+import bcrypt
+
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
 from django.utils import timezone
 
 from rest_framework.exceptions import AuthenticationFailed
 
+from nf_executor.api import enums
 from nf_executor.nextflow.auth import gen_password
 from nf_executor.api.tests.factories import JobFactory
+from nf_executor.nextflow.util import get_callback_url
 from nf_executor.nextflow.views import check_auth_for_job_event
 
 
@@ -24,6 +30,14 @@ class TestCallbackAuth(TestCase):
             print(e)
             self.fail('Valid auth should not raise an exception')
 
+    def test_callback_auth_accepts_legacy_bcrypt_token(self):
+        real_pwd = uuid.uuid4().bytes
+        job = JobFactory(is_submitted=True, callback_token=bcrypt.hashpw(real_pwd, bcrypt.gensalt()))
+
+        check_auth_for_job_event(job, real_pwd.hex())
+        with self.assertRaises(AuthenticationFailed, msg='Legacy tokens still reject a wrong nonce'):
+            check_auth_for_job_event(job, uuid.uuid4().hex)
+
     def test_callback_auth_wrong_password(self):
         real_pwd = uuid.uuid4().bytes
         callback_token = gen_password(real_pwd)
@@ -33,6 +47,13 @@ class TestCallbackAuth(TestCase):
         with self.assertRaises(AuthenticationFailed, msg='Wrong password should raise error'):
             check_auth_for_job_event(job, 'wrongpassword')
 
+    def test_callback_auth_malformed_nonce(self):
+        job = JobFactory(is_submitted=True, callback_token=gen_password(uuid.uuid4().bytes))
+
+        for nonce in ('not-hex', 42):
+            with self.subTest(nonce=nonce), self.assertRaises(AuthenticationFailed):
+                check_auth_for_job_event(job, nonce)
+
     def test_callback_auth_expired(self):
         real_pwd = uuid.uuid4().bytes
         callback_token = gen_password(real_pwd)
@@ -63,3 +84,52 @@ class TestCallbackAuth(TestCase):
 
         with self.assertRaises(AuthenticationFailed, msg='Expired job should reject events'):
             check_auth_for_job_event(job, None)
+
+
+class TestCallbackView(TestCase):
+    def _post_event(self, job, nonce, fixture):
+        fn = os.path.join(os.path.dirname(__file__), 'fixtures/json_events', fixture)
+        with open(fn, 'rb') as f:
+            body = f.read()
+        url = reverse('nextflow:callback', kwargs={'pk': job.pk})
+        return self.client.post(f'{url}?nonce={nonce.hex()}', body, content_type='application/json')
+
+    def test_task_events_update_one_record(self):
+        nonce = uuid.uuid4().bytes
+        job = JobFactory(is_started=True, callback_token=gen_password(nonce))
+
+        first = self._post_event(job, nonce, 'process_submitted.json')
+        second = self._post_event(job, nonce, 'process_started.json')
+
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first.json()['record_id'], second.json()['record_id'], 'Both events update the same task')
+        self.assertEqual(job.task_set.count(), 1, 'One task record was created')
+
+    def test_job_event_saves_through_narrowed_queryset(self):
+        nonce = uuid.uuid4().bytes
+        job = JobFactory(is_started=True, callback_token=gen_password(nonce), params={'input': 'kept'})
+
+        resp = self._post_event(job, nonce, 'job_completed.json')
+        self.assertEqual(resp.status_code, 200)
+
+        job.refresh_from_db()
+        self.assertTrue(enums.JobStatus.is_resolved(job.status), 'Job event status was persisted')
+        self.assertIsNotNone(job.completed_on, 'Completion time was persisted')
+        self.assertEqual(job.params, {'input': 'kept'}, 'Deferred columns are left untouched')
+
+    def test_task_event_is_one_job_lookup(self):
+        nonce = uuid.uuid4().bytes
+        job = JobFactory(is_started=True, callback_token=gen_password(nonce))
+
+        # Request savepoint, job, existing task lookup, task savepoint + insert, release both savepoints
+        with self.assertNumQueries(7):
+            self._post_event(job, nonce, 'process_submitted.json')
+
+    def test_callback_url_points_at_job_route(self):
+        job = JobFactory()
+        request = RequestFactory().get('/')
+
+        url = get_callback_url(request, job)
+
+        expected = request.build_absolute_uri(reverse('nextflow:callback', kwargs={'pk': job.pk}))
+        self.assertTrue(url.startswith(f'{expected}?nonce='), 'Cached route template matches a fresh reverse()')
@@ -1,21 +1,29 @@
+import functools
 import uuid
 
 from django.urls import reverse
-from django.utils.http import urlencode
 
 from nf_executor.nextflow.auth import gen_password
 from nf_executor.api.models import Job
 
 
+_PK_PLACEHOLDER = '__pk__'
+
+
+@functools.lru_cache(maxsize=None)
+def _callback_path_template() -> str:
+    # The route is static apart from the job ID, so only walk the URLconf once per process
+    return reverse('nextflow:callback', kwargs={'pk': _PK_PLACEHOLDER})
+
+
 def get_callback_url(request, job: Job):
     # We don't store the actual nonce "password" in the DB, so it is only known when the callback URL is first generated
     nonce = uuid.uuid4().bytes
     job.callback_token = gen_password(nonce)
-    job.save()
+    job.save(update_fields=['callback_token'])
 
     base_url = request.build_absolute_uri(
-        reverse('nextflow:callback', kwargs={'pk': job.pk})
+        _callback_path_template().replace(_PK_PLACEHOLDER, str(job.pk))
     )
 
-    token = urlencode({'nonce': nonce.hex()})
-    return f'{base_url}?{token}'
+    return f'{base_url}?nonce={nonce.hex()}'  # Hex digits are URL-safe: no encoding needed
@@ -5,8 +5,10 @@ import logging
 from datetime import timedelta
 
 from django.conf import settings
+from django.db import IntegrityError, transaction
 from django.http import HttpResponse
 from django.views.generic.detail import SingleObjectMixin
+import orjson
 
 from rest_framework.exceptions import AuthenticationFailed
 from rest_framework.request import Request
@@ -41,8 +43,9 @@ def check_auth_for_job_event(job, nonce):
 
     try:
         res = check_password(nonce, job.callback_token, expire_time=end)
-    except:
-        logger.debug('Unknown failure in password check')
+    except (ValueError, TypeError) as e:
+        # Malformed nonce (eg not hex) or stored token. Logged lazily: this runs on every callback
+        logger.debug('Failure in password check: %s', e)
         res = False
 
     if res is False:
@@ -55,7 +58,10 @@ class NextflowCallback(SingleObjectMixin, APIView):
       Payload structure and event names: https://www.nextflow.io/docs/latest/tracing.html#weblog-via-http
     """
     http_method_names = ('post',)
-    queryset = Job.objects.all()
+    # Skip columns that neither auth nor the event parsers use (params can be large). Saves of a deferred instance
+    #   skip those columns too. Deferring, rather than `only()`, means that a field newly written by a parser is
+    #   always loaded and saved.
+    queryset = Job.objects.defer('params', 'job_storage_root', 'owner', 'executor_id')
 
     def post(self, request: Request, pk):
         try:
@@ -67,8 +73,15 @@ class NextflowCallback(SingleObjectMixin, APIView):
 
         check_auth_for_job_event(job, request.query_params.get('nonce'))
 
-        record = parse_event(job, request.body)
-        record.save()
+        payload = orjson.loads(request.body)  # Decoded once, even if the save must be retried
+        record = parse_event(job, payload)
+        try:
+            with transaction.atomic():
+                record.save()
+        except IntegrityError:
+            # A concurrent event created the same task first. Apply this event on top of that record instead.
+            record = parse_event(job, payload)
+            record.save()
 
         # NF doesn't look at the response: it doesn't even log if the callback is unreachable!
         return Response({
@@ -79,33 +92,25 @@ class NextflowCallback(SingleObjectMixin, APIView):
 
 
 if settings.DEBUG:
-    import json
     from django.views.decorators.csrf import csrf_exempt
 
-    items = []  # Store items from the whole workflow until end
-
     @csrf_exempt
     def json_capture(request):
         """
         A simple endpoint for debugging/verification purposes.
          Captures raw HTTP payloads from a single nextflow process run manually outside the app.
 
+        Each payload is appended to `captured_{run_id}.ndjson` as it arrives (one JSON document per line), so
+         nothing accumulates in memory over a long run.
+
         *Everything about this code is a hack*, but it's useful for characterizing NF behavior
         """
-        global items
-
         if request.method == 'POST':
-            payload = json.loads(request.body)
-            event = payload['event']
+            payload = orjson.loads(request.body)
             run_id = payload['runId']
 
-            items.append(payload)
-
-            if event == 'completed':
-                with open(f'captured_{run_id}.json', 'w') as f:
-                    json.dump(items, f)
-
-                items = []
+            with open(f'captured_{run_id}.ndjson', 'ab') as f:
+                f.write(orjson.dumps(payload) + b'\n')
 
         return HttpResponse({
             'accepted': True
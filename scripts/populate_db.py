@@ -2,13 +2,17 @@
 Populate the database with sample data
 
 python3 scripts/populate_db.py -j 1 -t 2
+python3 scripts/populate_db.py -j 100 -t 1000 --fast  # Large datasets (postgres)
 """
 import argparse
 import os
 from pathlib import Path
+import random
 import sys
 
 import django
+from django.db import connection, transaction
+import factory.random
 import faker
 
 # Must configure standalone django usage before importing models
@@ -16,9 +20,13 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings.local')
 sys.path.append(str(Path(__file__).parents[1].resolve()))
 django.setup()
 
+from nf_executor.api import models  # noqa
 from nf_executor.api.tests import factories  # noqa
 
 
+BATCH_SIZE = 1000
+
+
 def parse_args():
     # By default, just loads mock workflow, not any jobs
     parser = argparse.ArgumentParser(description='Populate the database')
@@ -29,9 +37,32 @@ def parse_args():
     parser.add_argument('-t', '--n_tasks', dest='n_tasks',
                         type=int, default=0,
                         help='# tasks to create')
+
+    parser.add_argument('-s', '--seed', dest='seed',
+                        type=int, default=None,
+                        help='Random seed, for reproducible sample data')
+
+    parser.add_argument('--fast', dest='fast',
+                        action='store_true',
+                        help='Load tasks with COPY (postgres only; other databases use bulk inserts)')
     return parser.parse_args()
 
 
+def copy_rows(model, instances):
+    """
+    Postgres only: stream rows to the server with COPY, which skips the per-row INSERT parsing that bulk_create
+     still pays. Primary keys are assigned by the database and not read back.
+    """
+    fields = [f for f in model._meta.concrete_fields if not f.primary_key]
+    table = connection.ops.quote_name(model._meta.db_table)
+    columns = ', '.join(connection.ops.quote_name(f.column) for f in fields)
+
+    with connection.cursor() as cursor:
+        with cursor.copy(f'COPY {table} ({columns}) FROM STDIN') as copy:
+            for obj in instances:
+                copy.write_row([f.get_db_prep_save(getattr(obj, f.attname), connection) for f in fields])
+
+
 if __name__ == '__main__':
     args = parse_args()
 
@@ -39,17 +70,34 @@ if __name__ == '__main__':
     w = factories.get_mock_workflow()
 
     # Note: This will create job models, but not execute them against the workflow.
+    # Factories only build instances in memory; rows are written in bulk, one INSERT per batch
+    if args.seed is not None:
+        random.seed(args.seed)
+        factory.random.reseed_random(args.seed)
+        faker.Faker.seed(args.seed)
+
     fake = faker.Faker()
-    for i in range(args.n_jobs):
-        this_name = fake.name()
-        # These are fake data, which is to say that all fields are populated even if job status is not yet started
-        # We may improve the factories in future
-        mock_workflow_params = {'greeting': f'Hello, {this_name}'}
-        job = factories.JobFactory(
-            workflow=w,
-            params=mock_workflow_params,
-        )
-        for j in range(args.n_tasks):
-            task_id = str(j)
-            factories.TaskFactory(job=job, task_id=task_id, native_id=task_id)
+    names = [fake.name() for _ in range(args.n_jobs)]
+
+    # These are fake data, which is to say that all fields are populated even if job status is not yet started
+    # We may improve the factories in future
+    jobs = [
+        factories.JobFactory.build(workflow=w, params={'greeting': f'Hello, {this_name}'})
+        for this_name in names
+    ]
+    for job in jobs:
+        job.update_expiry()  # bulk_create skips save()
+
+    with transaction.atomic():
+        models.Job.objects.bulk_create(jobs, batch_size=BATCH_SIZE)
+
+        tasks = []
+        for job in jobs:
+            for j in range(args.n_tasks):
+                task_id = str(j)
+                tasks.append(factories.TaskFactory.build(job=job, task_id=task_id, native_id=task_id))
+        if args.fast and connection.vendor == 'postgresql':
+            copy_rows(models.Task, tasks)
+        else:
+            models.Task.objects.bulk_create(tasks, batch_size=BATCH_SIZE)
     print("Database populated successfully")